@@ -1,57 +1,263 @@
 import streamlit as st
-import pandas as pd
-import hashlib
-import os, json
+import uuid
+import asyncio
+import logging
 
 from core.overrides import intent_override
-from core.llm_client import get_llm, generate_python_code
-from core.executor import execute_code
-from utils.schema import generate_profiling_summary
-from core.rag_client import rag_answer
+from core.llm_client import (get_llm, generate_python_code, agenerate_python_code, partial_code,
+                             normalize_query, cached_code, remember_code, CODE_CACHE)
+from core.repair import run_with_repair, REPAIR_METRICS
+from core.result_cache import run_cached, RESULT_CACHE
+from core.rag_client import rag_answer, warm_up_rag
 from core.search_client import web_search
 from core.summary import ai_dataset_summary
-from core.export_utils import export_csv, export_plots, export_pdf
-from core.chat_memory import load_chat_history, append_chat, save_chat_history
+from core.export_utils import export_csv, export_plots, export_pdf, figure_png
+from core.chat_memory import load_recent_chats, append_chat, save_chat_history
+from core.data_loader import load_dataset
+from core.data_cleaning import CleaningPipeline, diagnose_data
+from core.semantic_cache import SEMANTIC_CACHE
+from core.jobs import get_job_manager, DONE, FAILED
+from utils.disk_cache import cache_key
 
-# ---------- Paths ----------
-UPLOAD_DIR = os.path.join("chat_history", "uploads")
-os.makedirs("chat_history", exist_ok=True)
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# ---------- Logging ----------
+logging.basicConfig(filename="app.log", level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # ---------- Streamlit config ----------
 st.set_page_config(page_title="AI Data Analyst", page_icon="🧑‍💻", layout="wide")
 
 # ---------- Helpers ----------
-def get_file_hash(uploaded_file):
-    return hashlib.md5(uploaded_file.getbuffer()).hexdigest()
+@st.cache_resource
+def start_background_warm_up():
+    """Runs once per server process."""
+    return warm_up_rag()
 
-def run_rag_or_search(query: str):
+def rag_or_search(query: str, job=None):
+    """Returns (title, answer) from RAG, falling back to web search."""
     rag_resp = rag_answer(query)
     if rag_resp and "could not find" not in rag_resp.lower() and "don't know" not in rag_resp.lower():
-        st.subheader("RAG Answer")
-        st.info(rag_resp)
+        return "RAG Answer", rag_resp
+    if job is not None:
+        job.report("RAG didn’t find an answer. Searching the web... 🌐")
+    return "Web Search Answer", web_search(query)
+
+
+FANOUT_MODES = ("analyze", "visualize", "summarize")
+
+
+def new_outcome(query: str, mode: str) -> dict:
+    return {"query": query or "Dataset Summary", "mode": mode, "code": None, "notice": None, "summary": None,
+            "result": None, "figs": None, "error": None, "fallback": None, "repairs": []}
+
+
+def response_text_of(out: dict) -> str:
+    """The chat-log response for a code run."""
+    if out["error"]:
+        return f"Error: {out['error']}"
+    text = str(out["result"]) if out["result"] is not None else ""
+    if out["figs"]:
+        text += f"\n📊 {len(out['figs'])} plot(s) generated."
+    return text or "Analysis complete with no text output."
+
+
+def execute_and_repair(job, out, llm, df, file_id, data_version, user_query, code, profiling_summary=None,
+                       cached=None):
+    """
+    Runs `code` into `out`; if it fails, the model gets the error and the
+    columns back and the fixed code is re-run (bounded, see core.repair).
+    Code that ran successfully goes into CODE_CACHE unless it is an override
+    template (no `profiling_summary`) or already the `cached` entry.
+    """
+    def run(candidate):
+        return run_cached(candidate, df, file_id, data_version, cancel_event=job.cancel_event)
+
+    fixed_code, out["result"], out["figs"], out["error"], out["repairs"] = run_with_repair(
+        code, run, llm, df, user_query,
+        on_attempt=lambda n: job.report(f"{out['mode'].capitalize()}: code failed, repair attempt {n}..."),
+    )
+    out["code"] = fixed_code
+    if not out["error"] and profiling_summary is not None and fixed_code != cached:
+        remember_code(llm, df, user_query, out["mode"], profiling_summary, fixed_code)
+
+
+def analysis_job(job, llm, pipeline, file_id, user_query: str, mode: str) -> dict:
+    """
+    Background job behind the Analyze / Visualize / Summarize buttons. Returns
+    the outcome the script shows once the job is done; the chat turn is logged here.
+    """
+    df, data_version = pipeline.df, pipeline.version
+    out = new_outcome(user_query, mode)
+    if mode == "summarize":
+        job.report("Summarizing the dataset...")
+        out["summary"] = response_text = ai_dataset_summary(df, dataset_id=pipeline.dataset_id, llm=llm,
+                                                            cancel_event=job.cancel_event)
     else:
-        with st.spinner("RAG didn’t find an answer. Searching the web... 🌐"):
-            search_resp = web_search(query)
-            st.subheader("Web Search Answer")
-            st.info(search_resp)
+        code = intent_override(user_query, df, mode)
+        profiling_summary = cached = None
+        if code is None:
+            # Exact repeats come from CODE_CACHE before any similar question is considered.
+            profile = pipeline.profile()
+            profiling_summary = profile.summary_str()
+            code = cached = cached_code(llm, df, user_query, mode, profiling_summary)
+        if code is None:
+            similar = SEMANTIC_CACHE.lookup(file_id, user_query, mode, data_version)
+            if similar:
+                code, matched_query, score = similar
+                out["notice"] = f"♻️ Reusing code from a similar question: \"{matched_query}\" (similarity {score:.2f})"
+            else:
+                job.report("Generating code...")
+                code = generate_python_code(
+                    llm, df, user_query, mode, profiling_summary, use_cache=False, profile=profile,
+                    on_token=lambda text: job.report(output=partial_code(text)),
+                )
+        job.report("Running the code...", output=code)
+        execute_and_repair(job, out, llm, df, file_id, data_version, user_query, code, profiling_summary, cached)
+        job.check()
+        response_text = response_text_of(out)
+        if out["error"]:
+            out["fallback"] = rag_or_search(user_query, job)
+
+    if file_id:
+        append_chat(file_id, out["query"], response_text,
+                    code=out["code"] if out["code"] and not out["error"] else None, mode=mode,
+                    data_version=data_version)
+    return out
+
+
+def fanout_job(job, llm, pipeline, file_id, user_query: str) -> dict:
+    """
+    Analyze, visualize and summarize the same question at once: one profile
+    is computed and shared, the three generations are in flight together
+    (asyncio), and each code run gets its own sandbox worker. Outcomes land
+    in `job.partials` as they finish, so the page can show them early.
+    """
+    df, data_version = pipeline.df, pipeline.version
+    profile = pipeline.profile()
+    profiling_summary = profile.summary_str()
+
+    async def run_mode(mode: str):
+        out = new_outcome(user_query, mode)
+        code = intent_override(user_query, df, mode)
+        is_template = code is not None
+        cached = None if is_template else cached_code(llm, df, user_query, mode, profiling_summary)
+        if code is None:
+            code = cached
+        if code is None:
+            code = await agenerate_python_code(llm, df, user_query, mode, profiling_summary, use_cache=False,
+                                               profile=profile)
+        job.check()
+        await asyncio.to_thread(execute_and_repair, job, out, llm, df, file_id, data_version, user_query, code,
+                                None if is_template else profiling_summary, cached)
+        job.partials[mode] = out
+        job.report(f"{len(job.partials)} of {len(FANOUT_MODES)} done", fraction=len(job.partials) / len(FANOUT_MODES))
+
+    async def run_all():
+        await asyncio.gather(*(run_mode(mode) for mode in FANOUT_MODES))
+
+    job.report("Generating code for all three modes...", fraction=0.0)
+    asyncio.run(run_all())
+    if file_id:
+        for mode in FANOUT_MODES:
+            out = job.partials[mode]
+            append_chat(file_id, user_query, response_text_of(out),
+                        code=out["code"] if not out["error"] else None, mode=mode, data_version=data_version)
+    return {"query": user_query, "mode": "all", "outputs": {mode: job.partials[mode] for mode in FANOUT_MODES}}
+
+
+def repair_note(out: dict) -> str:
+    fixed = sum(a["fixed"] for a in out["repairs"])
+    seconds = sum(a["seconds"] for a in out["repairs"])
+    return (f"🔧 {'Fixed' if fixed else 'Could not fix'} the failing code automatically "
+            f"({len(out['repairs'])} attempt(s), +{seconds:.1f}s)")
+
+
+def show_output(out: dict):
+    """Code, error, result and plots of one mode's run."""
+    if out["repairs"]:
+        st.caption(repair_note(out))
+    if out["code"]:
+        with st.expander("Generated Code"):
+            st.code(out["code"], language="python")
+    if out["error"]:
+        st.error(f"❌ Code execution failed: {out['error']}")
+        return
+    if out["result"] is not None:
+        st.write(out["result"])
+    for fig in out["figs"] or []:
+        st.image(figure_png(fig))
+
+
+def show_fanout(outputs: dict):
+    tabs = st.tabs([mode.capitalize() for mode in FANOUT_MODES])
+    for tab, mode in zip(tabs, FANOUT_MODES):
+        with tab:
+            if mode in outputs:
+                show_output(outputs[mode])
+            else:
+                st.caption("⏳ Still running...")
+
+
+def session_owner() -> str:
+    """Id of this browser session; shared background jobs are held per session (see JobManager.cancel)."""
+    return st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
+
+@st.fragment(run_every=1.0)
+def job_status(job_id: str):
+    """Polls the running job; once it finishes the whole page reruns to show the outcome."""
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    st.info(f"⏳ {job.label}: {job.status} · {job.elapsed:.0f}s")
+    if job.fraction is not None:
+        st.progress(job.fraction)
+    if job.progress:
+        st.caption(job.progress)
+    if job.output:
+        st.code(job.output, language="python")
+    if job.partials:
+        show_fanout(dict(job.partials))
+    if st.button("✖️ Cancel", key=f"cancel_{job_id}"):
+        # Another session may still wait for the same job; this one stops following it either way.
+        manager.cancel(job_id, owner=session_owner())
+        st.session_state.active_job = None
+        st.session_state.outcome = {"cancelled": True}
+        st.rerun()
+
+
+def collect_job(job):
+    """Moves a finished job's outcome into the session."""
+    st.session_state.active_job = None
+    if job.status == DONE:
+        out = job.result
+        st.session_state.outcome = out
+        if out["mode"] == "summarize":
+            st.session_state.summary_text = out["summary"]
+        elif out["mode"] != "all" and not out["error"]:
+            st.session_state.result, st.session_state.figs = out["result"], out["figs"]
+        st.session_state.last_loaded_query = None
+        st.session_state.last_loaded_response = None
+        st.session_state.show_prev_chat = False
+    elif job.status == FAILED:
+        st.session_state.outcome = {"error": job.error.strip().splitlines()[-1], "crashed": True}
+    else:
+        st.session_state.outcome = {"cancelled": True}
+
 
 # ---------- Main ----------
 def main():
     st.title("AI Data Analyst 📈")
+    start_background_warm_up()
 
     # ---------- CSV Upload in Main Page ----------
     st.subheader("Upload Dataset")
     uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"])
     
     if uploaded_file:
-        df = pd.read_csv(uploaded_file)
+        df, file_id = load_dataset(uploaded_file)
         st.session_state.df = df
         st.session_state.file_name = uploaded_file.name
-        st.session_state.file_id = get_file_hash(uploaded_file)
-        file_path = os.path.join(UPLOAD_DIR, f"{st.session_state.file_id}.csv")
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        st.session_state.file_id = file_id
         st.success(f"✅ Loaded {uploaded_file.name} ({df.shape[0]} rows, {df.shape[1]} columns)")
 
     # Stop if no dataset uploaded
@@ -59,8 +265,15 @@ def main():
         st.info("Please upload a CSV file to start.")
         st.stop()
 
-    df = st.session_state.df
-    st.success(f"✅ Data loaded ({df.shape[0]} rows, {df.shape[1]} columns)")
+    # ---------- Cleaning pipeline (op log over the uploaded data) ----------
+    pipeline = st.session_state.get("cleaning")
+    if pipeline is None or pipeline.base is not st.session_state.df:
+        pipeline = CleaningPipeline.load(st.session_state.df, st.session_state.get("file_id"))
+        st.session_state.cleaning = pipeline
+    df = pipeline.df
+    data_version = pipeline.version
+    st.success(f"✅ Data loaded ({df.shape[0]} rows, {df.shape[1]} columns)"
+               + (f" · cleaned, version {data_version}" if data_version else ""))
 
     # ---------- Dataset Preview ----------
     st.dataframe(df.head(), use_container_width=True)
@@ -69,13 +282,23 @@ def main():
     with st.sidebar:
         st.subheader("Chats")
         if st.session_state.get("file_id"):
-            history = load_chat_history(st.session_state.file_id)
+            chat_limit = st.session_state.get("chat_limit", 20)
+            history, total_chats = load_recent_chats(st.session_state.file_id, limit=chat_limit)
             if history:
-                for i, chat in enumerate(reversed(history)):
+                for i, chat in enumerate(history):
                     if st.button(chat['query'][:60], key=f"chat_btn_{st.session_state.file_id}_{i}"):
                         st.session_state.last_loaded_query = chat['query']
                         st.session_state.last_loaded_response = chat['response']
                         st.session_state.show_prev_chat = True
+                        st.session_state.result, st.session_state.figs = None, None
+                        if chat.get('code'):
+                            # Replay the stored code: instant from the result cache, else re-run it.
+                            result, figs, err = run_cached(chat['code'], df, st.session_state.file_id, data_version)
+                            if not err:
+                                st.session_state.result, st.session_state.figs = result, figs
+                if total_chats > len(history) and st.button(f"Show older chats ({total_chats - len(history)} more)"):
+                    st.session_state.chat_limit = chat_limit + 20
+                    st.rerun()
 
             if st.button("🗑️ Clear Chat History"):
                 save_chat_history(st.session_state.file_id, [])
@@ -85,11 +308,53 @@ def main():
                 st.session_state.last_loaded_query = None
                 st.session_state.last_loaded_response = None
                 st.session_state.show_prev_chat = False
+                st.session_state.outcome = None
         else:
             st.info("Upload a dataset to start.")
 
+        with st.expander("🧹 Data Cleaning"):
+            if st.button("🔍 Diagnose data"):
+                st.session_state.diagnosis = (data_version, diagnose_data(df))
+            diagnosis = st.session_state.get("diagnosis")
+            issues = diagnosis[1] if diagnosis and diagnosis[0] == data_version else None
+            if issues:
+                st.write(f"Missing cells: {issues['missing_values']:.1%} · Duplicate rows: {issues['duplicate_rows']}")
+                if issues['type_mismatches']:
+                    st.write("Type mismatches: " + ", ".join(f"{c} → {t}" for c, t in issues['type_mismatches'].items()))
+                st.caption(f"Diagnosed in {issues['timings']['total']:.2f}s")
+
+            strategy = st.selectbox("Fill missing values with", ["mean", "median", "MISSING"])
+            step = None
+            if st.button("Fill missing values"):
+                step = ("fill_missing", {"strategy": strategy})
+            if st.button("Drop duplicate rows"):
+                step = ("drop_duplicates", {})
+            if issues and issues['type_mismatches'] and st.button("Fix type mismatches"):
+                step = ("coerce_types", {"mismatches": issues['type_mismatches']})
+            if step:
+                try:
+                    pipeline.add(step[0], **step[1])
+                except Exception as e:
+                    st.error(f"❌ Cleaning step failed and was not applied: {e}")
+                else:
+                    st.rerun()
+            if pipeline.ops:
+                st.caption("Applied: " + " → ".join(op["op"] for op in pipeline.ops))
+                if st.button("↩️ Undo last step"):
+                    pipeline.undo()
+                    st.rerun()
+
+        st.caption(f"⚡ Code cache: {CODE_CACHE.hits} hits · {CODE_CACHE.misses} misses")
+        st.caption(f"💾 Result cache: {RESULT_CACHE.hits} hits · {RESULT_CACHE.misses} misses")
+        st.caption(f"🧠 Similar-question reuse saved {SEMANTIC_CACHE.llm_calls_saved} LLM call(s)")
+        if REPAIR_METRICS["failures"]:
+            st.caption(f"🔧 Self-repair fixed {REPAIR_METRICS['repaired']} of {REPAIR_METRICS['failures']} failed run(s)")
+        job_counts = get_job_manager().stats()
+        st.caption(f"⏳ Background jobs: {job_counts.get('running', 0)} running · {job_counts.get('queued', 0)} queued")
+
     # ---------- Init session keys ----------
-    for key in ['figs', 'summary_text', 'result', 'last_loaded_query', 'last_loaded_response', 'show_prev_chat']:
+    for key in ['figs', 'summary_text', 'result', 'last_loaded_query', 'last_loaded_response', 'show_prev_chat',
+                'active_job', 'outcome']:
         if key not in st.session_state:
             st.session_state[key] = None
 
@@ -105,54 +370,62 @@ def main():
         st.subheader("Previous Chat Response")
         st.write(st.session_state.last_loaded_response)
 
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     analyze_button = col1.button("📊 Analyze")
     visualize_button = col2.button("📈 Visualize")
     summarize_button = col3.button("📝 Summarize")
+    all_button = col4.button("🚀 All three")
 
-    if analyze_button or visualize_button or summarize_button:
+    manager = get_job_manager()
+    if analyze_button or visualize_button or summarize_button or all_button:
         if not user_query and not summarize_button:
             st.warning("Please enter a question to analyze or visualize.")
             st.stop()
 
-        query_to_log = user_query if user_query else "Dataset Summary"
-        with st.spinner("The AI is working..."):
-            try:
-                response_text = ""
-                if summarize_button:
-                    st.session_state.summary_text = ai_dataset_summary(df)
-                    response_text = st.session_state.summary_text
-                else:
-                    mode = "visualize" if visualize_button else "analyze"
-                    code = intent_override(user_query, df, mode) or generate_python_code(
-                        get_llm(), df, user_query, mode, generate_profiling_summary(df)
-                    )
-                    st.subheader("Generated Code")
-                    st.code(code, language="python")
-                    result, figs, err = execute_code(code, df)
-
-                    if err:
-                        st.error(f"❌ Code execution failed: {err}")
-                        response_text = f"Error: {err}"
-                        run_rag_or_search(user_query)
-                    else:
-                        st.session_state.result = result
-                        st.session_state.figs = figs
-                        if result is not None:
-                            response_text += str(result)
-                        if figs:
-                            response_text += f"\n📊 {len(figs)} plot(s) generated."
-                        if not response_text:
-                            response_text = "Analysis complete with no text output."
-
-                if st.session_state.get("file_id"):
-                    append_chat(st.session_state.file_id, query_to_log, response_text)
-                    st.session_state.last_loaded_query = None
-                    st.session_state.last_loaded_response = None
-                    st.session_state.show_prev_chat = False
-
-            except Exception as e:
-                st.error(f"An error occurred: {e}")
+        mode = ("all" if all_button else "summarize" if summarize_button
+                else "visualize" if visualize_button else "analyze")
+        file_id = st.session_state.get("file_id")
+        # Same question on the same data while it is still running: reuse that job.
+        key = cache_key(file_id, pipeline.dataset_id, mode, normalize_query(user_query or "")) if file_id else None
+        label = f"{mode.capitalize()}: {user_query[:40]}" if user_query else "Dataset summary"
+        st.session_state.outcome = None
+        if mode == "all":
+            job_id = manager.submit(fanout_job, get_llm(), pipeline.snapshot(), file_id, user_query,
+                                    label=label, key=key, owner=session_owner())
+        else:
+            job_id = manager.submit(analysis_job, get_llm(), pipeline.snapshot(), file_id, user_query, mode,
+                                    label=label, key=key, owner=session_owner())
+        st.session_state.active_job = job_id
+
+    # ---------- Background job ----------
+    job_id = st.session_state.get("active_job")
+    job = manager.get(job_id) if job_id else None
+    if job is not None and job.done:
+        collect_job(job)
+    elif job is not None:
+        job_status(job_id)
+
+    outcome = st.session_state.get("outcome")
+    if outcome:
+        if outcome.get("cancelled"):
+            st.warning("Request cancelled.")
+        elif outcome.get("crashed"):
+            st.error(f"An error occurred: {outcome['error']}")
+        elif outcome["mode"] == "all":
+            show_fanout(outcome["outputs"])
+        else:
+            if outcome["notice"]:
+                st.caption(outcome["notice"])
+            if outcome["repairs"]:
+                st.caption(repair_note(outcome))
+            if outcome["code"]:
+                st.subheader("Generated Code")
+                st.code(outcome["code"], language="python")
+            if outcome["error"]:
+                st.error(f"❌ Code execution failed: {outcome['error']}")
+                title, answer = outcome["fallback"]
+                st.subheader(title)
+                st.info(answer)
 
     # ---------- Display outputs ----------
     if st.session_state.summary_text:
@@ -166,7 +439,7 @@ def main():
     if st.session_state.figs:
         st.subheader("Plots")
         for fig in st.session_state.figs:
-            st.pyplot(fig)
+            st.image(figure_png(fig))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_chat_memory.py
+"""
+Chat history with 10k turns: whole-file JSON rewrite per turn (old) vs the
+append-only log, for appends and for the sidebar's per-rerun read.
+
+Run from the repo root:  python -m benchmarks.bench_chat_memory [turns]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from core import chat_memory
+
+
+def legacy_append(path, query, response):
+    """The pre-JSONL implementation: load everything, append, rewrite everything."""
+    history = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            history = json.load(f)
+    history.append({"query": query, "response": response})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2, ensure_ascii=False)
+
+
+def legacy_load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(turns: int = 10_000):
+    response = "The team that won the most matches is Mumbai Indians (112 wins). " * 3
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_memory.CHAT_DIR = tmp
+        legacy_path = os.path.join(tmp, "legacy.json")
+
+        start = time.perf_counter()
+        for i in range(turns):
+            legacy_append(legacy_path, f"question {i}", response)
+        t_old = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(turns):
+            chat_memory.append_chat("bench", f"question {i}", response)
+        t_new = time.perf_counter() - start
+
+        start = time.perf_counter()
+        legacy_load(legacy_path)
+        t_old_read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        chat_memory.load_recent_chats("bench", limit=20)
+        t_new_read = time.perf_counter() - start
+
+        chat_memory._cache.clear()
+        start = time.perf_counter()
+        chat_memory.load_recent_chats("bench", limit=20)
+        t_cold_read = time.perf_counter() - start
+
+    print(f"{turns} appends:  JSON rewrite {t_old:7.2f} s | append-only log {t_new:7.3f} s")
+    print(f"sidebar read:  JSON load {t_old_read * 1000:7.2f} ms | cached latest 20 {t_new_read * 1000:7.3f} ms"
+          f" | cold latest 20 {t_cold_read * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
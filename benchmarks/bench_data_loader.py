@@ -0,0 +1,68 @@
+# benchmarks/bench_data_loader.py
+"""
+Load time and memory for a ~100 MB CSV: pd.read_csv on every rerun (old)
+vs the loader's first parse and its snapshot reloads.
+
+Run from the repo root:  python -m benchmarks.bench_data_loader [rows]
+"""
+import io
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from core import data_loader
+
+
+def _make_csv(rows: int) -> bytes:
+    rng = np.random.default_rng(0)
+    teams = np.array([f"Team {i}" for i in range(10)])
+    df = pd.DataFrame({
+        "match_id": np.arange(rows),
+        "season": rng.integers(2008, 2024, rows),
+        "team": teams[rng.integers(0, 10, rows)],
+        "opponent": teams[rng.integers(0, 10, rows)],
+        "venue": np.array([f"Stadium {i}" for i in range(40)])[rng.integers(0, 40, rows)],
+        "score": rng.integers(80, 260, rows),
+        "run_rate": rng.random(rows) * 12,
+        "player": np.array([f"Player {i}" for i in range(5000)])[rng.integers(0, 5000, rows)],
+    })
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - start
+
+
+def _mb(df) -> float:
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def main(rows: int = 1_600_000):
+    raw = _make_csv(rows)
+    print(f"CSV: {len(raw) / 1e6:.0f} MB, {rows} rows")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_loader.UPLOAD_DIR = tmp
+        old, t_old = _timed(lambda: pd.read_csv(io.BytesIO(raw)))
+        print(f"{'pd.read_csv (every rerun)':>30}: {t_old:6.2f} s, {_mb(old):7.1f} MB in memory")
+
+        (new, file_id), t_first = _timed(lambda: data_loader.load_dataset_bytes(raw))
+        print(f"{'loader, first upload':>30}: {t_first:6.2f} s, {_mb(new):7.1f} MB in memory")
+
+        data_loader._frames.clear()
+        snap, t_snap = _timed(lambda: data_loader.cached_dataset(file_id))
+        size = os.path.getsize(data_loader._snapshot_path(file_id)) / 1e6
+        print(f"{'loader, snapshot (new process)':>30}: {t_snap:6.2f} s ({size:.0f} MB Feather file)")
+
+        _, t_hot = _timed(lambda: data_loader.cached_dataset(file_id))
+        print(f"{'loader, rerun (same process)':>30}: {t_hot * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,79 @@
+# benchmarks/bench_diagnose.py
+"""
+diagnose_data on a wide frame: the previous full-column implementation vs
+the probing one. The legacy version is run on a slice (it takes minutes at
+full size) and its time scaled linearly.
+
+Run from the repo root:  python -m benchmarks.bench_diagnose [rows]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.data_cleaning import diagnose_data
+
+
+def legacy_diagnose_data(df: pd.DataFrame) -> dict:
+    issues = {}
+    issues['missing_values'] = df.isnull().sum().sum() / (df.shape[0] * df.shape[1])
+    issues['duplicate_rows'] = df.duplicated().sum()
+    mismatches = {}
+    for col in df.columns:
+        if df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype):
+            coerced_num = pd.to_numeric(df[col], errors='coerce')
+            if coerced_num.notnull().sum() > 0 and coerced_num.isnull().sum() > 0:
+                mismatches[col] = "numeric"
+            coerced_date = pd.to_datetime(df[col], errors='coerce', format='mixed')
+            if coerced_date.notnull().sum() > 0 and coerced_date.isnull().sum() > 0:
+                mismatches[col] = "datetime"
+    issues['type_mismatches'] = mismatches
+    return issues
+
+
+def make_frame(rows: int, n_cols: int = 50) -> pd.DataFrame:
+    """Floats, ints, dates with a few bad values, categories, and numbers stored as text."""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2000-01-01", periods=5000).strftime("%Y-%m-%d").to_numpy()
+    cols = {}
+    for i in range(n_cols):
+        kind = i % 5
+        if kind == 0:
+            cols[f"c{i}"] = rng.random(rows)
+        elif kind == 1:
+            cols[f"c{i}"] = rng.integers(0, 100, rows)
+        elif kind == 2:
+            v = rng.choice(dates, rows).astype(object)
+            v[rng.random(rows) < 0.001] = "unknown"
+            cols[f"c{i}"] = v
+        elif kind == 3:
+            cols[f"c{i}"] = rng.choice(["alpha", "beta", "gamma", "delta"], rows)
+        else:
+            v = rng.integers(0, 1000, rows).astype(str).astype(object)
+            v[rng.random(rows) < 0.01] = "n/a"
+            cols[f"c{i}"] = v
+    df = pd.DataFrame(cols)
+    return pd.concat([df, df.iloc[: rows // 1000]], ignore_index=True)
+
+
+def main(rows: int = 1_000_000, legacy_rows: int = 20_000):
+    df = make_frame(rows)
+    start = time.perf_counter()
+    issues = diagnose_data(df)
+    new = time.perf_counter() - start
+
+    part = df.iloc[:legacy_rows]
+    start = time.perf_counter()
+    legacy_diagnose_data(part)
+    legacy = (time.perf_counter() - start) * len(df) / legacy_rows
+
+    timings = ", ".join(f"{k} {v:.2f}s" for k, v in issues["timings"].items())
+    print(f"{len(df):,} rows x {df.shape[1]} cols")
+    print(f"  legacy (scaled from {legacy_rows:,} rows): ~{legacy:.1f}s")
+    print(f"  probing: {new:.2f}s ({timings})")
+    print(f"  {len(issues['type_mismatches'])} mismatched columns, {issues['duplicate_rows']} duplicate rows")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
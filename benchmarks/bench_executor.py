@@ -0,0 +1,66 @@
+# benchmarks/bench_executor.py
+"""
+Per-call latency of execute_code: one-shot Manager + Process (old) vs the warm pool.
+
+Run from the repo root:  python -m benchmarks.bench_executor
+"""
+import multiprocessing
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.executor import _run_job, execute_code, get_sandbox_pool, sanitize_code
+
+SNIPPETS = [
+    "result = df['score'].mean()",
+    "result = df.groupby('team')['score'].sum().idxmax()",
+    "df.groupby('team')['score'].mean().plot(kind='bar')\nresult = 'ok'",
+]
+
+
+def _legacy_worker(code_to_run, df, return_dict):
+    return_dict.update(_run_job(code_to_run, df))
+
+
+def legacy_execute_code(code, df, timeout=15):
+    """The pre-pool implementation: a new Manager and Process per call."""
+    code_to_run = sanitize_code(code)
+    manager = multiprocessing.Manager()
+    return_dict = manager.dict()
+    p = multiprocessing.Process(target=_legacy_worker, args=(code_to_run, df, return_dict))
+    p.start()
+    p.join(timeout)
+    out = return_dict.get("result"), return_dict.get("figs"), return_dict.get("error")
+    manager.shutdown()
+    return out
+
+
+def _time_calls(fn, df, repeats):
+    timings = []
+    for _ in range(repeats):
+        for code in SNIPPETS:
+            start = time.perf_counter()
+            _, _, err = fn(code, df)
+            timings.append(time.perf_counter() - start)
+            assert err is None, err
+    return timings
+
+
+def main(rows: int = 10_000, repeats: int = 5):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "team": rng.choice(["A", "B", "C", "D"], rows),
+        "score": rng.integers(0, 250, rows),
+    })
+    get_sandbox_pool()  # start-up cost is paid once, at app start
+
+    for name, fn in (("one-shot process", legacy_execute_code), ("warm pool", execute_code)):
+        t = _time_calls(fn, df, repeats)
+        print(f"{name:>17}: median {statistics.median(t) * 1000:7.1f} ms, "
+              f"p95 {sorted(t)[int(len(t) * 0.95) - 1] * 1000:7.1f} ms over {len(t)} calls")
+
+
+if __name__ == "__main__":
+    main()
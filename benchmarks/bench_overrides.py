@@ -0,0 +1,50 @@
+# benchmarks/bench_overrides.py
+"""
+Override matching cost as the rule registry grows: the compiled router vs a
+chain of substring checks (the old if/elif style) over the same rules.
+
+Run from the repo root:  python -m benchmarks.bench_overrides
+"""
+import timeit
+
+import pandas as pd
+
+from core.overrides import ROUTER, OverrideRouter, OverrideRule
+
+QUERIES = [
+    ("which team chose to bat first most", "visualize"),
+    ("who is the best bowler this season", "analyze"),
+    ("what is the average margin of victory", "analyze"),
+]
+
+
+def _router(extra_rules: int) -> OverrideRouter:
+    router = OverrideRouter()
+    for rule in ROUTER.rules:
+        router.register(rule)
+    for i in range(extra_rules):
+        router.register(OverrideRule(f"synthetic_{i}", [(f"metric{i} trend",), ("chart",)], "result = 0"))
+    return router
+
+
+def _substring_chain(router: OverrideRouter, query: str, mode: str):
+    q = query.lower().strip()
+    for rule in router.rules:
+        if mode in rule.modes and all(any(t in q for t in group) for group in rule.terms):
+            return rule
+    return None
+
+
+def main(number: int = 2000):
+    df = pd.DataFrame(columns=["Toss Decision", "Toss Winner", "Bowler", "Wickets"])
+    for extra in (0, 100, 1000):
+        router = _router(extra)
+        compiled = timeit.timeit(lambda: [router.match(q, df, m) for q, m in QUERIES], number=number)
+        chain = timeit.timeit(lambda: [_substring_chain(router, q, m) for q, m in QUERIES], number=number)
+        per = number * len(QUERIES)
+        print(f"{len(router.rules):5d} rules: router {compiled / per * 1e6:6.1f} us, "
+              f"substring chain {chain / per * 1e6:7.1f} us per query")
+
+
+if __name__ == "__main__":
+    main()
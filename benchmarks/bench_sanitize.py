@@ -0,0 +1,85 @@
+# benchmarks/bench_sanitize.py
+"""
+Validation + compilation cost per snippet: regex/substring sanitize_code (old)
+vs the AST policy, cold (first sight of a snippet) and warm (cached).
+
+Run from the repo root:  python -m benchmarks.bench_sanitize
+"""
+import re
+import timeit
+
+import pandas as pd
+
+from core.executor import compile_sandboxed
+from core.overrides import intent_override
+
+OLD_FORBIDDEN_KEYWORDS = [
+    "open(", "os.", "sys.", "subprocess", "shutil", "eval", "exec(",
+    "import socket", "import requests", "while True", "time.sleep(", "input("
+]
+
+GENERATED = [
+    "result = df['Wining Team'].value_counts().idxmax()",
+    "counts = df.groupby('Stadium')['Score A'].mean()\nresult = counts.sort_values().iloc[0]",
+    "import pandas as pd\nteam = df['Toss Winner'].unique()[0]\nresult = f'First toss winner: {team}'",
+    "top = df.nlargest(5, 'Score A')\nplt.figure(figsize=(8, 5))\nplt.bar(top['Wining Team'], top['Score A'])\n"
+    "plt.title('Top scores')\nplt.tight_layout()\nresult = top[['Wining Team', 'Score A']]",
+    "summary = []\nfor col in df.columns:\n    summary.append(f'{col}: {df[col].nunique()} unique')\n"
+    "result = '\\n'.join(summary)",
+]
+
+
+def legacy_sanitize(code: str) -> str:
+    """The pre-AST implementation, kept here only for comparison."""
+    code = re.sub(r'^\s*import\s+[^\n]+', '', code, flags=re.MULTILINE)
+    code = re.sub(r'^\s*from\s+[^\n]+\s+import\s+[^\n]+', '', code, flags=re.MULTILINE)
+    code = re.sub(r'```', '', code)
+    for kw in OLD_FORBIDDEN_KEYWORDS:
+        if kw in code:
+            raise ValueError(f"Blocked unsafe keyword in code: {kw}")
+    fixed_lines = []
+    for line in code.splitlines():
+        if ".iloc[0]" in line:
+            line = line.replace(".iloc[0]", ".pipe(safe_get_first)")
+        if ".unique()[0]" in line:
+            if "=" in line:
+                variable_part, expression_part = line.split("=", 1)
+                expression_part = expression_part.strip().replace(".unique()[0]", ".unique()")
+                line = f"{variable_part.strip()} = safe_get_first({expression_part})"
+            else:
+                line = f"result = safe_get_first({line.strip().replace('.unique()[0]', '.unique()')})"
+        fixed_lines.append(line)
+    return "\n".join(fixed_lines)
+
+
+def _corpus():
+    df = pd.DataFrame(columns=["Toss Decision", "Toss Winner", "Wining Team", "Man of the Match",
+                               "Stadium", "Score A", "Score B", "Extras A", "Extras B"])
+    queries = [("which team chose to bat first most", "visualize"), ("best batting stadium", "analyze"),
+               ("man of the match", "visualize"), ("toss win match", "analyze"), ("total extras", "analyze")]
+    overrides = [intent_override(q, df, mode) for q, mode in queries]
+    return GENERATED + [code for code in overrides if code]
+
+
+def main(number: int = 200):
+    corpus = _corpus()
+
+    def old():
+        for code in corpus:
+            compile(legacy_sanitize(code), "<string>", "exec")
+
+    def new_cold():
+        for code in corpus:
+            compile_sandboxed.__wrapped__(code)
+
+    def new_warm():
+        for code in corpus:
+            compile_sandboxed(code)
+
+    for name, fn in (("regex + compile", old), ("AST, cold", new_cold), ("AST, cached", new_warm)):
+        per_snippet = timeit.timeit(fn, number=number) / (number * len(corpus))
+        print(f"{name:>16}: {per_snippet * 1e6:8.1f} us per snippet ({len(corpus)} snippets)")
+
+
+if __name__ == "__main__":
+    main()
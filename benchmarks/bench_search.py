@@ -0,0 +1,48 @@
+# benchmarks/bench_search.py
+"""
+Web search fallback cost, fully offline: a FixtureBackend with simulated
+network latency stands in for DuckDuckGo. Compares calling the backend for
+every fallback (the old behaviour) with SearchClient (TTL cache, coalescing
+of identical in-flight queries, rate limiting).
+
+Run from the repo root:  python -m benchmarks.bench_search
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.search_client import FixtureBackend, SearchClient
+from utils.disk_cache import DiskLRUCache
+
+LATENCY = 0.3
+FIXTURES = {
+    f"what is metric {i}": [{"title": f"Metric {i}", "body": f"Metric {i} measures thing {i}.", "href": f"https://example.com/{i}"}]
+    for i in range(20)
+}
+# 5 analysts hitting the fallback with overlapping questions, 3 rounds.
+WORKLOAD = [f"What is metric {i % 4}?" for i in range(5)] * 3
+
+
+def run(search, label: str, backend: FixtureBackend):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        for i in range(0, len(WORKLOAD), 5):
+            list(pool.map(search, WORKLOAD[i:i + 5]))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:6.2f}s  backend calls: {backend.calls}")
+
+
+def main():
+    direct = FixtureBackend(FIXTURES, latency=LATENCY)
+    run(lambda q: direct.search(q, 3), "uncached (backend per call)", direct)
+
+    cache = DiskLRUCache("bench_search", ttl=60)
+    cache.clear()
+    backend = FixtureBackend(FIXTURES, latency=LATENCY)
+    client = SearchClient(backend, cache=cache, min_interval=0.0)
+    run(client.search, "SearchClient", backend)
+    print(f"{'':<28} coalesced: {client.coalesced}, cache hits: {cache.hits}")
+    cache.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_ttft.py
+"""
+Time-to-first-token for repeated questions on one dataset: the old single
+prompt (schema, then question, then instructions) vs the stable system prefix
++ question messages, which lets Ollama reuse its prompt (KV) cache.
+
+Needs a running Ollama with the model pulled. Run from the repo root:
+    python -m benchmarks.bench_ttft [model]
+"""
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.llm_client import LLM_KEEP_ALIVE, LLM_NUM_CTX
+from core.prompt_builder import build_messages, build_prompt_parts
+from utils.schema import DatasetProfile
+
+QUESTIONS = [
+    "Which team scored the most runs?",
+    "What is the average score per venue?",
+    "Which player has the highest strike rate?",
+    "How many matches were played each season?",
+]
+
+
+def legacy_prompt(df, user_query, mode, profile):
+    """The previous layout: dataset context, then the question, then the instructions."""
+    prefix, suffix = build_prompt_parts(df, user_query, mode, profile.summary_str(), profile)
+    rules, _, context = prefix.partition("**DataFrame Schema:**")
+    return f"**DataFrame Schema:**{context}\n{suffix}\n{rules}"
+
+
+def ttft(llm, prompt) -> float:
+    start = time.perf_counter()
+    stream = llm.stream(prompt)
+    try:
+        next(iter(stream))
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    return time.perf_counter() - start
+
+
+def main(model: str = "llama3.2:3b", rounds: int = 3):
+    from langchain_ollama import ChatOllama
+    llm = ChatOllama(model=model, temperature=0.0, keep_alive=LLM_KEEP_ALIVE, num_ctx=LLM_NUM_CTX)
+
+    rng = np.random.default_rng(0)
+    rows = 5_000
+    df = pd.DataFrame({
+        "team": rng.choice(["CSK", "MI", "RCB", "KKR"], rows),
+        "venue": rng.choice(["Chennai", "Mumbai", "Bengaluru", "Kolkata"], rows),
+        "player": rng.choice([f"player_{i}" for i in range(200)], rows),
+        "season": rng.integers(2008, 2024, rows),
+        "runs": rng.integers(0, 120, rows),
+        "balls": rng.integers(1, 70, rows),
+        **{f"stat_{i}": rng.random(rows) for i in range(40)},
+    })
+    profile = DatasetProfile.compute(df)
+
+    ttft(llm, "Say OK.")  # load the model once
+    for name, make in (
+        ("question mid-prompt", lambda q: legacy_prompt(df, q, "analyze", profile)),
+        ("stable prefix", lambda q: build_messages(df, q, "analyze", profile.summary_str(), profile)),
+    ):
+        first, repeated = [], []
+        for r in range(rounds):
+            for q in QUESTIONS:
+                (first if r == 0 else repeated).append(ttft(llm, make(q)))
+        print(f"{name:>20}: first round {statistics.median(first) * 1000:7.0f} ms, "
+              f"later rounds {statistics.median(repeated) * 1000:7.0f} ms median TTFT")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
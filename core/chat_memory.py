@@ -1,34 +1,182 @@
 import os, json
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are still serialized within this process
+    fcntl = None
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CHAT_DIR = os.path.join(BASE_DIR, "..", "chat_history")
 os.makedirs(CHAT_DIR, exist_ok=True)
 
+# A log with unreadable lines (e.g. a write cut short by a crash) is rewritten every this many turns.
+COMPACT_EVERY = 1000
+
+# file_id -> {"mtime": ns, "size": bytes, "ino": int, "head": first line, "turns": [...], "bad_lines": int}
+_cache = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+
 def _get_file_path(file_id: str) -> str:
+    return os.path.join(CHAT_DIR, f"{file_id}.jsonl")
+
+def _legacy_path(file_id: str) -> str:
     return os.path.join(CHAT_DIR, f"{file_id}.json")
 
+def _lock(file_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(file_id, threading.Lock())
+
+class _FileLock:
+    """Exclusive advisory lock on the open log, so sessions in other processes don't interleave."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def __enter__(self):
+        if fcntl:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+
+
+def _parse_lines(data: bytes):
+    turns, bad = [], 0
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            turns.append(json.loads(line))
+        except ValueError:
+            bad += 1
+    return turns, bad
+
+def _write_atomic(path: str, turns: list):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for turn in turns:
+            f.write(json.dumps(turn, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+def _migrate_legacy(file_id: str):
+    """Converts an old pretty-printed <file_id>.json history into the append-only log."""
+    legacy = _legacy_path(file_id)
+    if not os.path.exists(legacy) or os.path.exists(_get_file_path(file_id)):
+        return
+    try:
+        with open(legacy, "r", encoding="utf-8") as f:
+            turns = json.load(f)
+    except Exception:
+        turns = []
+    _write_atomic(_get_file_path(file_id), turns)
+    os.remove(legacy)
+
+def _load(file_id: str) -> dict:
+    """Returns the cache entry for file_id, reading only what was appended since the last look."""
+    _migrate_legacy(file_id)
+    path = _get_file_path(file_id)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        _cache.pop(file_id, None)
+        return {"mtime": None, "size": 0, "ino": None, "head": b"", "turns": [], "bad_lines": 0}
+
+    entry = _cache.get(file_id)
+    if entry and entry["mtime"] == st.st_mtime_ns and entry["size"] == st.st_size:
+        return entry
+
+    with open(path, "rb") as f:
+        start = 0
+        # A grown file is only read from where we stopped if it is still the same log:
+        # save/compact replace the file, and a rewrite can end up larger than before.
+        if (entry and st.st_size > entry["size"] and entry["ino"] == st.st_ino
+                and f.readline() == entry["head"]):
+            start = entry["size"]
+        f.seek(start)
+        data = f.read(st.st_size - start)
+    # Stop at the last complete line; a write still in flight is picked up next time.
+    data = data[:data.rfind(b"\n") + 1]
+    turns, bad = _parse_lines(data)
+    if start:
+        # Only appends happened since we last read: extend with the tail.
+        entry["turns"].extend(turns)
+        entry.update(mtime=st.st_mtime_ns, size=start + len(data), bad_lines=entry["bad_lines"] + bad)
+    else:
+        entry = {"mtime": st.st_mtime_ns, "size": len(data), "ino": st.st_ino,
+                 "head": data[:data.find(b"\n") + 1], "turns": turns, "bad_lines": bad}
+    _cache[file_id] = entry
+    return entry
+
+
 def load_chat_history(file_id: str):
     """Load chat history for a given dataset (file_id)."""
-    path = _get_file_path(file_id)
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return []
-    return []
+    with _lock(file_id):
+        return list(_load(file_id)["turns"])
+
+def load_recent_chats(file_id: str, limit: int = 20, offset: int = 0):
+    """Newest-first page of turns for the sidebar, plus the total number of turns."""
+    with _lock(file_id):
+        turns = _load(file_id)["turns"]
+    end = len(turns) - offset
+    return list(reversed(turns[max(end - limit, 0):max(end, 0)])), len(turns)
 
 def save_chat_history(file_id: str, history: list):
     """Save the full chat history for a dataset."""
-    path = _get_file_path(file_id)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(history, f, indent=2, ensure_ascii=False)
+    with _lock(file_id):
+        _write_atomic(_get_file_path(file_id), history)
+        _cache.pop(file_id, None)
+
+def compact_chat_history(file_id: str, max_turns: int = None):
+    """Rewrites the log without unreadable lines, optionally keeping only the latest `max_turns`."""
+    with _lock(file_id):
+        turns = _load(file_id)["turns"]
+        _write_atomic(_get_file_path(file_id), turns[-max_turns:] if max_turns else turns)
+        _cache.pop(file_id, None)
 
-def append_chat(file_id: str, query: str, response: str):
-    """Append a single chat turn and persist it."""
-    history = load_chat_history(file_id)
-    history.append({
+def append_chat(file_id: str, query: str, response: str, code: str = None, mode: str = None,
+                data_version: str = ""):
+    """
+    Append a single chat turn and persist it. `code`/`mode` are kept for successful
+    analyses, with the cleaning version of the data the code ran on.
+    """
+    turn = {
         "query": query,
         "response": response
-    })
-    save_chat_history(file_id, history)
+    }
+    if code:
+        turn["code"] = code
+        turn["mode"] = mode
+        if data_version:
+            turn["data_version"] = data_version
+    line = (json.dumps(turn, ensure_ascii=False) + "\n").encode("utf-8")
+
+    with _lock(file_id):
+        entry = _load(file_id)
+        path = _get_file_path(file_id)
+        with open(path, "ab+") as f, _FileLock(f):
+            before = os.fstat(f.fileno()).st_size
+            if before:
+                f.seek(before - 1)
+                if f.read(1) != b"\n":
+                    # Terminate a line left unfinished by a crashed writer.
+                    line = b"\n" + line
+            f.write(line)  # "a" mode: always written at the end, wherever we read
+            f.flush()
+            after = os.fstat(f.fileno())
+
+        if (entry["size"] == before and after.st_size == before + len(line)
+                and entry["ino"] in (None, after.st_ino)):
+            # Nobody else wrote in between: extend the cache instead of re-reading.
+            entry["turns"].append(turn)
+            entry.update(mtime=after.st_mtime_ns, size=after.st_size, ino=after.st_ino,
+                         head=entry["head"] or line)
+            _cache[file_id] = entry
+        else:
+            _cache.pop(file_id, None)
+
+    if entry.get("bad_lines") and len(entry["turns"]) % COMPACT_EVERY == 0:
+        compact_chat_history(file_id)
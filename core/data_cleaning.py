@@ -1,60 +1,324 @@
 # core/data_cleaning.py
+import os
+import json
+import time
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from utils.disk_cache import cache_key
+from utils.schema import get_dataset_profile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CLEANING_DIR = os.path.join(BASE_DIR, "..", "chat_history", "uploads")
+
+# Values probed per column before deciding whether a full parse is needed.
+PROBE_SIZE = 1000
+# Below this many candidate rows, duplicates are checked on full rows directly.
+EXACT_DUPLICATE_ROWS = 10_000
+
+
+def _is_text(series: pd.Series) -> bool:
+    # object columns, pandas' string dtype (the default for text from pandas 3 on),
+    # and categoricals of text (the loader categorizes low-cardinality text columns)
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    return dtype == object or pd.api.types.is_string_dtype(dtype)
+
+
+def _numeric_ok(values) -> np.ndarray:
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').notna().to_numpy()
+
+
+def _datetime_ok(values) -> np.ndarray:
+    """
+    Which values `pd.to_datetime(format='mixed')` can parse. Most date columns use
+    one format, so that format (guessed from the first value) is tried with the
+    vectorized parser first and only the leftovers go through the slow mixed parser.
+    """
+    values = pd.Series(values, dtype=object)
+    ok = np.zeros(len(values), dtype=bool)
+    if not len(values):
+        return ok
+    fmt = guess_datetime_format(str(values.iloc[0]))
+    if fmt:
+        ok = pd.to_datetime(values, errors='coerce', format=fmt).notna().to_numpy(copy=True)
+    rest = ~ok & values.notna().to_numpy()
+    if rest.any():
+        ok[rest] = pd.to_datetime(values[rest], errors='coerce', format='mixed').notna().to_numpy()
+    return ok
+
+
+def _column_mismatch(series: pd.Series):
+    """
+    Same rule as before: a column is a mismatch if some but not all of its cells
+    coerce to numeric / datetime (datetime wins when both do). A sample of the
+    non-null values is probed first; a check nothing in the sample passes is
+    ruled out without touching the rest of the column. Otherwise the column's
+    unique values are parsed once and weighted by their counts.
+    """
+    non_null = series.dropna()
+    if non_null.empty:
+        return None
+    probe = non_null.sample(min(PROBE_SIZE, len(non_null)), random_state=0).to_numpy(dtype=object)
+    checks = [("numeric", _numeric_ok), ("datetime", _datetime_ok)]
+    pending = [(name, parse) for name, parse in checks if parse(probe).any()]
+    if not pending:
+        return None
+
+    codes, uniques = pd.factorize(series)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    found = None
+    for name, parse in pending:
+        parsed = counts[parse(np.asarray(uniques, dtype=object))].sum()
+        if 0 < parsed < len(series):
+            found = name
+    return found
+
+
+def duplicate_mask(df: pd.DataFrame) -> np.ndarray:
+    """
+    Exact df.duplicated() as a boolean array, without hashing whole rows: a row
+    can only be a duplicate if its value repeats in every column, so candidates
+    are narrowed one column at a time (numeric columns first, they hash
+    cheapest and are usually the most selective) and only the survivors are
+    compared in full.
+    """
+    mask = np.zeros(len(df), dtype=bool)
+    if df.empty:
+        return mask
+    candidates = np.arange(len(df))
+    order = sorted(range(df.shape[1]), key=lambda j: not pd.api.types.is_numeric_dtype(df.dtypes.iloc[j]))
+    for j in order:
+        if len(candidates) <= EXACT_DUPLICATE_ROWS:
+            break
+        values = df.iloc[candidates, j]
+        candidates = candidates[values.duplicated(keep=False).to_numpy()]
+    if len(candidates):
+        mask[candidates] = df.iloc[candidates].duplicated().to_numpy()
+    return mask
+
 
 def diagnose_data(df: pd.DataFrame) -> dict:
-    """Diagnose missing values, duplicate rows, and type mismatches."""
-    issues = {}
+    """
+    Diagnose missing values, duplicate rows, and type mismatches.
+    Text columns are checked one after another on a single core (the parsers hold
+    the GIL, so threads would not help); `issues['timings']` has the seconds spent per check.
+    """
+    issues, timings = {}, {}
+    start = time.perf_counter()
 
     # Missing values (percentage of missing across all cells)
-    issues['missing_values'] = df.isnull().sum().sum() / (df.shape[0] * df.shape[1])
+    t = time.perf_counter()
+    cells = df.shape[0] * df.shape[1]
+    issues['missing_values'] = df.isnull().sum().sum() / cells if cells else 0.0
+    timings['missing_values'] = time.perf_counter() - t
 
     # Duplicate rows count
-    issues['duplicate_rows'] = df.duplicated().sum()
+    t = time.perf_counter()
+    issues['duplicate_rows'] = int(duplicate_mask(df).sum())
+    timings['duplicate_rows'] = time.perf_counter() - t
 
     # Type mismatches: try to infer
-    mismatches = {}
-    for col in df.columns:
-        if df[col].dtype == object:
-            # Try numeric
-            coerced_num = pd.to_numeric(df[col], errors='coerce')
-            if coerced_num.notnull().sum() > 0 and coerced_num.isnull().sum() > 0:
-                mismatches[col] = "numeric"
-
-            # --- UPDATED LINE ---
-            # Try date, using format='mixed' for efficiency and to suppress warnings
-            coerced_date = pd.to_datetime(df[col], errors='coerce', format='mixed')
-            if coerced_date.notnull().sum() > 0 and coerced_date.isnull().sum() > 0:
-                mismatches[col] = "datetime"
-
-    issues['type_mismatches'] = mismatches
+    t = time.perf_counter()
+    text_cols = [col for col in df.columns if _is_text(df[col])]
+    results = {col: _column_mismatch(df[col]) for col in text_cols}
+    issues['type_mismatches'] = {col: kind for col, kind in results.items() if kind}
+    timings['type_mismatches'] = time.perf_counter() - t
+
+    timings['total'] = time.perf_counter() - start
+    issues['timings'] = timings
     return issues
 
 
-def fix_missing(df: pd.DataFrame, strategy: str = "mean") -> pd.DataFrame:
-    """Fix missing values by strategy: mean, median, or fill 'MISSING'."""
-    for col in df.columns:
-        if df[col].isnull().any():
-            if strategy == "mean" and pd.api.types.is_numeric_dtype(df[col]):
-                df[col] = df[col].fillna(df[col].mean())
-            elif strategy == "median" and pd.api.types.is_numeric_dtype(df[col]):
-                df[col] = df[col].fillna(df[col].median())
-            else:
-                df[col] = df[col].fillna("MISSING")
-    return df
+# --- Cleaning operations ---
+# Each takes the working frame plus its parameters, replaces only the columns it
+# changes (whole-column assignment, never in-place writes) and returns
+# (frame, touched_columns).
 
+def _fill_missing(df: pd.DataFrame, strategy: str = "mean", columns=None):
+    cols = [c for c in (df.columns if columns is None else columns) if df[c].isnull().any()]
+    numeric = [c for c in cols if pd.api.types.is_numeric_dtype(df[c])]
+    fills = {}
+    if strategy == "mean" and numeric:
+        fills = df[numeric].mean().to_dict()
+    elif strategy == "median" and numeric:
+        fills = df[numeric].median().to_dict()
+    for col in cols:
+        value = fills.get(col, "MISSING")
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+            # Categoricals only accept known categories (the loader categorizes low-cardinality text).
+            series = series.cat.add_categories([value])
+        df[col] = series.fillna(value)
+    return df, set(cols)
 
-def fix_duplicates(df: pd.DataFrame) -> pd.DataFrame:
-    """Remove duplicate rows."""
-    return df.drop_duplicates()
 
+def _drop_duplicates(df: pd.DataFrame):
+    mask = duplicate_mask(df)
+    if not mask.any():
+        return df, set()
+    return df[~mask], set(df.columns)
 
-def fix_types(df: pd.DataFrame, mismatches: dict) -> pd.DataFrame:
-    """Fix type mismatches by coercion."""
+
+def _coerce_types(df: pd.DataFrame, mismatches: dict):
     for col, target_type in mismatches.items():
         if target_type == "numeric":
             df[col] = pd.to_numeric(df[col], errors='coerce')
         elif target_type == "datetime":
-            # --- UPDATED LINE ---
             # Also add format='mixed' here for consistency
             df[col] = pd.to_datetime(df[col], errors='coerce', format='mixed')
-    return df
\ No newline at end of file
+    return df, set(mismatches)
+
+
+OPERATIONS = {
+    "fill_missing": _fill_missing,
+    "drop_duplicates": _drop_duplicates,
+    "coerce_types": _coerce_types,
+}
+
+
+def fix_missing(df: pd.DataFrame, strategy: str = "mean") -> pd.DataFrame:
+    """Fix missing values by strategy: mean, median, or fill 'MISSING'."""
+    return _fill_missing(df, strategy)[0]
+
+
+def fix_duplicates(df: pd.DataFrame) -> pd.DataFrame:
+    """Remove duplicate rows."""
+    return _drop_duplicates(df)[0]
+
+
+def fix_types(df: pd.DataFrame, mismatches: dict) -> pd.DataFrame:
+    """Fix type mismatches by coercion."""
+    return _coerce_types(df, mismatches)[0]
+
+
+class CleaningPipeline:
+    """
+    Ordered cleaning operations over an immutable base frame.
+
+    Operations are only recorded when added; the cleaned frame is built on
+    first access, in one pass over a shallow copy of the base, so columns no
+    operation touches are never copied. The log is persisted next to the
+    upload, every state has a stable `version` id (a hash of the base id and
+    the operations, "" for the raw data) for downstream caches to key on, and
+    `undo()` drops the last operation.
+    """
+
+    MAX_CACHED_VERSIONS = 3
+
+    def __init__(self, base: pd.DataFrame, base_id: str, ops=None):
+        self.base = base
+        self.base_id = base_id
+        self.ops = list(ops or [])
+        self._frames = OrderedDict()  # version -> (frame, touched columns)
+
+    @classmethod
+    def load(cls, base: pd.DataFrame, base_id: str):
+        """The pipeline saved for `base_id`, or an empty one."""
+        try:
+            with open(cls._log_path(base_id), "r", encoding="utf-8") as f:
+                ops = json.load(f)
+        except (OSError, ValueError):
+            ops = []
+        return cls(base, base_id, [op for op in ops if op.get("op") in OPERATIONS])
+
+    @staticmethod
+    def _log_path(base_id: str) -> str:
+        return os.path.join(CLEANING_DIR, f"{base_id}.cleaning.json")
+
+    def _save(self):
+        os.makedirs(CLEANING_DIR, exist_ok=True)
+        path = self._log_path(self.base_id)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.ops, f, indent=2, default=str)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _version(base_id: str, ops: list) -> str:
+        if not ops:
+            return ""
+        return cache_key(base_id, json.dumps(ops, sort_keys=True, default=str))[:12]
+
+    @property
+    def version(self) -> str:
+        return self._version(self.base_id, self.ops)
+
+    @property
+    def dataset_id(self) -> str:
+        """Id of the current data: the upload's file_id, suffixed with the version once cleaned."""
+        return f"{self.base_id}.{self.version}" if self.ops else self.base_id
+
+    def add(self, op: str, **params) -> str:
+        """
+        Appends an operation and returns the new version id. The new version is
+        built before the log is saved; an operation that fails is not recorded.
+        """
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown cleaning operation: {op}")
+        self.ops.append({"op": op, "params": params})
+        try:
+            self._build()
+        except Exception:
+            self.ops.pop()
+            raise
+        self._save()
+        return self.version
+
+    def undo(self):
+        """Removes the last operation; returns it, or None if there was nothing to undo."""
+        if not self.ops:
+            return None
+        op = self.ops.pop()
+        self._save()
+        return op
+
+    def reset(self):
+        self.ops = []
+        self._save()
+
+    def snapshot(self):
+        """A copy pinned to the current version, for background jobs; later add/undo don't affect it."""
+        snap = CleaningPipeline(self.base, self.base_id, self.ops)
+        if self.ops:
+            snap._frames[self.version] = self._build()
+        return snap
+
+    def _build(self):
+        version = self.version
+        if version in self._frames:
+            self._frames.move_to_end(version)
+            return self._frames[version]
+        frame, touched = self.base.copy(deep=False), set()
+        for op in self.ops:
+            frame, cols = OPERATIONS[op["op"]](frame, **op.get("params", {}))
+            touched |= cols
+        self._frames[version] = (frame, touched)
+        while len(self._frames) > self.MAX_CACHED_VERSIONS:
+            self._frames.popitem(last=False)
+        return frame, touched
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """The cleaned frame (the base itself when no operations are applied)."""
+        return self.base if not self.ops else self._build()[0]
+
+    @property
+    def changed_columns(self) -> list:
+        """Columns any operation changed (all of them once rows were dropped)."""
+        if not self.ops:
+            return []
+        frame, touched = self._build()
+        return [c for c in frame.columns if c in touched]
+
+    def profile(self):
+        """DatasetProfile of the current data; a cleaned version reuses the raw profile's unchanged columns."""
+        base = get_dataset_profile(self.base, self.base_id)
+        if not self.ops:
+            return base
+        return get_dataset_profile(self.df, self.dataset_id, changed_columns=self.changed_columns,
+                                   base_id=self.base_id)
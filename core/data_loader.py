@@ -1,18 +1,168 @@
 import streamlit as st
 import pandas as pd
+import codecs
+import hashlib
 import io
+import os
+import threading
+from collections import OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOAD_DIR = os.path.join(BASE_DIR, "..", "chat_history", "uploads")
+
+# Text columns become `category` only when values repeat heavily and the frame is big enough to care.
+CATEGORY_MAX_RATIO = 0.05
+CATEGORY_MIN_ROWS = 1000
+MAX_CACHED_FRAMES = 2
+# Bumped whenever parse_csv / optimize_dtypes change what a snapshot holds, so older snapshots are re-parsed.
+SNAPSHOT_VERSION = 2
+CSV_ENCODINGS = ("utf-8-sig", "utf-8", "latin-1")
+
+_frames = OrderedDict()
+_frames_lock = threading.Lock()
+
+
+def content_hash(raw: bytes) -> str:
+    """The dataset's file_id: MD5 of the uploaded bytes (same as chat histories already use)."""
+    return hashlib.md5(raw).hexdigest()
+
+
+def _decodes(raw: bytes, encoding: str, chunk_size: int = 1 << 20) -> bool:
+    """True if all of `raw` is valid in `encoding` (checked in chunks, without keeping the text)."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        for start in range(0, len(raw), chunk_size):
+            decoder.decode(raw[start:start + chunk_size])
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def detect_encoding(raw: bytes) -> str:
+    """
+    The first of utf-8-sig/utf-8/latin-1 the bytes actually decode in. Probed up
+    front because pyarrow doesn't fail on invalid utf-8; it returns the cells as bytes.
+    """
+    if raw.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    return next(enc for enc in CSV_ENCODINGS[1:] if _decodes(raw, enc))
+
+
+def parse_csv(raw: bytes) -> pd.DataFrame:
+    """Parses CSV bytes in their detected encoding, with the pyarrow engine when available."""
+    encoding = detect_encoding(raw)
+    last_error = None
+    for engine in ("pyarrow", "c"):
+        try:
+            return pd.read_csv(io.BytesIO(raw), encoding=encoding, engine=engine)
+        except Exception as e:
+            last_error = e
+    raise ValueError(f"Unable to parse CSV: {last_error}")
+
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrinks memory without changing what analysis code computes: only
+    low-cardinality text columns become `category`. Numbers keep their
+    64-bit dtypes, since narrower integers overflow silently in the column
+    arithmetic generated code does.
+    """
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_string_dtype(s.dtype) and len(s) >= CATEGORY_MIN_ROWS:
+            if s.nunique() <= CATEGORY_MAX_RATIO * len(s):
+                out[col] = s.astype("category")
+    return df.assign(**out) if out else df
+
+
+def _snapshot_path(file_id: str) -> str:
+    return os.path.join(UPLOAD_DIR, f"{file_id}.v{SNAPSHOT_VERSION}.feather")
+
+
+def load_snapshot(file_id: str):
+    """Memory-maps the Feather snapshot for `file_id`, or returns None if there isn't one."""
+    path = _snapshot_path(file_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        from pyarrow import feather
+        return feather.read_feather(path, memory_map=True)
+    except Exception:
+        return None
+
+
+def save_snapshot(file_id: str, df: pd.DataFrame):
+    try:
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        tmp = f"{_snapshot_path(file_id)}.tmp"
+        df.to_feather(tmp)
+        os.replace(tmp, _snapshot_path(file_id))
+    except Exception:
+        # No pyarrow, or a frame Feather can't hold: the next load just parses the CSV again.
+        pass
+
+
+def _remember(file_id: str, df: pd.DataFrame):
+    with _frames_lock:
+        _frames[file_id] = df
+        _frames.move_to_end(file_id)
+        while len(_frames) > MAX_CACHED_FRAMES:
+            _frames.popitem(last=False)
+
+
+def cached_dataset(file_id: str):
+    """The already-loaded frame for `file_id` (in-process, else its snapshot), or None."""
+    with _frames_lock:
+        df = _frames.get(file_id)
+    if df is None:
+        df = load_snapshot(file_id)
+    if df is not None:
+        _remember(file_id, df)
+    return df
+
+
+def load_dataset_bytes(raw: bytes):
+    """
+    Returns (df, file_id). Each dataset is parsed once: later calls, from any
+    page or session, reuse the in-process frame or the on-disk snapshot.
+    """
+    file_id = content_hash(raw)
+    df = cached_dataset(file_id)
+    if df is None:
+        df = optimize_dtypes(parse_csv(raw))
+        csv_path = os.path.join(UPLOAD_DIR, f"{file_id}.csv")
+        if not os.path.exists(csv_path):
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
+            with open(csv_path, "wb") as f:
+                f.write(raw)
+        save_snapshot(file_id, df)
+        _remember(file_id, df)
+    return df, file_id
+
+
+def load_dataset(uploaded_file):
+    """
+    Streamlit entry point: returns (df, file_id) for an UploadedFile. The
+    upload is read and hashed once per session, not on every rerun.
+    """
+    upload_key = getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+    known = st.session_state.setdefault("_upload_hashes", {})
+    if upload_key in known:
+        df = cached_dataset(known[upload_key])
+        if df is not None:
+            return df, known[upload_key]
+
+    df, file_id = load_dataset_bytes(uploaded_file.getvalue())
+    known[upload_key] = file_id
+    return df, file_id
+
 
-@st.cache_data
 def load_csv(uploaded_file):
     """Load uploaded CSV with multiple encodings fallback."""
     try:
-        raw = uploaded_file.getvalue()
-        for enc in ("utf-8-sig", "utf-8", "latin-1"):
-            try:
-                return pd.read_csv(io.StringIO(raw.decode(enc)))
-            except Exception:
-                continue
-        raise UnicodeDecodeError("Unable to decode file with utf-8/latin-1.")
+        return load_dataset(uploaded_file)[0]
     except Exception as e:
         st.error(f"Error reading CSV: {e}")
         return None
@@ -1,17 +1,124 @@
+import gc
 import io
 import re
+import time
+import ast
+import types
+import atexit
+import marshal
+import functools
+import textwrap
+import threading
 import traceback
+import weakref
+from collections import OrderedDict
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
+import contextlib
 from contextlib import redirect_stdout
 import multiprocessing
+from multiprocessing import resource_tracker
+
+from core.shared_frame import AttachedFrame, SharedFrame, SharedFrameHandle
+
+# --- Guardrails: sandbox namespace ---
+SANDBOX_BUILTINS = {
+    "len": len, "min": min, "max": max, "sum": sum, "sorted": sorted, "range": range,
+    "print": print, "round": round, "enumerate": enumerate, "abs": abs, "zip": zip,
+    "str": str, "int": int, "float": float, "bool": bool, "list": list, "dict": dict,
+    "set": set, "tuple": tuple, "any": any, "all": all, "map": map, "filter": filter,
+    "reversed": reversed, "isinstance": isinstance,
+    "Exception": Exception, "ValueError": ValueError, "KeyError": KeyError,
+    "TypeError": TypeError, "IndexError": IndexError, "ZeroDivisionError": ZeroDivisionError,
+}
+SANDBOX_GLOBALS = frozenset({"pd", "np", "plt", "df", "safe_get_first", "result"})
+SANDBOX_FILENAME = "<sandbox>"
+
+# Attributes that reach the filesystem, other modules or the interpreter; anything starting with "_" is blocked too,
+# as is every `read_*` reader, every `to_*` method outside SAFE_CONVERSIONS / TEXT_EXPORTS, and the
+# frame, code, traceback and generator introspection attributes (gi_frame.f_back.f_builtins, ...).
+FORBIDDEN_ATTRIBUTES = frozenset({
+    "os", "sys", "io", "subprocess", "shutil", "socket", "builtins", "importlib", "pathlib", "ctypes",
+    "ctypeslib", "load_library",
+    "savefig", "save", "savez", "savez_compressed", "savetxt", "tofile", "dump", "imsave", "imread",
+    "load", "loadtxt", "fromfile", "fromregex", "genfromtxt", "memmap", "open_memmap", "DataSource",
+    "HDFStore", "ExcelWriter", "ExcelFile",
+})
+INTROSPECTION_PREFIXES = ("gi_", "cr_", "ag_", "f_", "tb_", "co_")
+# `to_*` methods that only convert in memory.
+SAFE_CONVERSIONS = frozenset({
+    "to_numeric", "to_datetime", "to_timedelta", "to_dict", "to_list", "to_frame", "to_numpy",
+    "to_period", "to_timestamp", "to_series", "to_flat_index", "to_records", "to_pydatetime", "to_offset",
+})
+# `to_*` methods that return text when called without a destination (their first parameter is the path or buffer).
+TEXT_EXPORTS = frozenset({"to_string", "to_markdown", "to_json", "to_csv", "to_html", "to_latex", "to_xml"})
+DESTINATION_KEYWORDS = frozenset({"buf", "path", "path_or_buf", "path_or_buffer", "filepath_or_buffer"})
+# Methods that evaluate an expression string; the string must be a literal and passes the same policy.
+EXPRESSION_METHODS = frozenset({"eval", "query"})
+# The only submodules reachable through pd/np/plt; np.lib, pd.io, plt.matplotlib and the rest are blocked.
+SANDBOX_MODULES = {"pd": pd, "np": np, "plt": plt}
+SAFE_SUBMODULES = frozenset({
+    "api", "types", "arrays", "offsets", "tseries", "errors", "dtypes",
+    "char", "strings", "emath", "fft", "linalg", "ma", "polynomial", "random", "cm",
+})
+
+
+def _attribute_allowed(attr: str) -> bool:
+    if (attr.startswith("_") or attr in FORBIDDEN_ATTRIBUTES or attr.startswith("read_")
+            or attr.startswith(INTROSPECTION_PREFIXES)):
+        return False
+    return not attr.startswith("to_") or attr in SAFE_CONVERSIONS or attr in TEXT_EXPORTS
+
+
+def _sandbox_module(node):
+    """The module a `pd` / `np.linalg`-style expression refers to, or None."""
+    if isinstance(node, ast.Name):
+        return SANDBOX_MODULES.get(node.id)
+    if isinstance(node, ast.Attribute):
+        parent = _sandbox_module(node.value)
+        value = getattr(parent, node.attr, None) if parent is not None else None
+        return value if isinstance(value, types.ModuleType) else None
+    return None
+
+
+class _ModuleProxy:
+    """
+    What generated code gets for pd / np / plt: attribute access goes through
+    the same allow-list at run time, so an alias (`m = np; m.lib`) can't reach
+    what the AST pass blocks for the literal names. Allowed submodules come
+    back wrapped as well.
+    """
+
+    __slots__ = ("_module",)
+
+    def __init__(self, module):
+        object.__setattr__(self, "_module", module)
+
+    def __getattr__(self, attr):
+        if not _attribute_allowed(attr):
+            raise AttributeError(f"Blocked unsafe attribute in code: .{attr}")
+        value = getattr(self._module, attr)
+        if isinstance(value, types.ModuleType):
+            if attr not in SAFE_SUBMODULES:
+                raise AttributeError(f"Blocked unsafe module in code: .{attr}")
+            return _ModuleProxy(value)
+        return value
+
+    def __setattr__(self, attr, value):
+        raise AttributeError(f"Sandbox module {self._module.__name__} is read-only")
+
+    def __dir__(self):
+        return [name for name in dir(self._module) if _attribute_allowed(name)]
+
+    def __repr__(self):
+        return f"<sandboxed module {self._module.__name__}>"
+
+
+SANDBOX_MODULE_PROXIES = {name: _ModuleProxy(module) for name, module in SANDBOX_MODULES.items()}
 
-# --- Guardrails: Forbidden Keywords ---
-FORBIDDEN_KEYWORDS = [
-    "open(", "os.", "sys.", "subprocess", "shutil", "eval", "exec(",
-    "import socket", "import requests", "while True", "time.sleep(", "input("
-]
 
 def safe_get_first(obj):
     """Safely return the first element of an iterable, else None."""
@@ -24,56 +131,212 @@ def safe_get_first(obj):
         return None
     return None
 
+
+class _SandboxTransformer(ast.NodeTransformer):
+    """
+    Single pass over generated code: drops imports, rejects unsafe constructs,
+    and rewrites `.iloc[0]` / `.unique()[0]` into `safe_get_first` calls.
+    Names are checked against the sandbox allow-list once the whole tree is seen.
+    """
+
+    def __init__(self):
+        self.bound = set()
+        self.loaded = set()
+        self.rewrote = False
+        self._checked_calls = set()  # ids of `.to_csv` / `.query`-style attributes whose call was validated
+
+    def visit_Import(self, node):
+        return None
+
+    visit_ImportFrom = visit_Import
+
+    def visit_Name(self, node):
+        if node.id.startswith("__"):
+            raise ValueError(f"Blocked unsafe name in code: {node.id}")
+        if node.id in SANDBOX_MODULES and not isinstance(node.ctx, ast.Load):
+            raise ValueError(f"Blocked rebinding of module name in code: {node.id}")
+        if isinstance(node.ctx, ast.Load):
+            self.loaded.add(node.id)
+        else:
+            self.bound.add(node.id)
+        return node
+
+    def visit_arg(self, node):
+        self.bound.add(node.arg)
+        return self.generic_visit(node)
+
+    def _bind(self, node, *names):
+        self.bound.update(n for n in names if n)
+        return self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        return self._bind(node, node.name)
+
+    def visit_ClassDef(self, node):
+        return self._bind(node, node.name)
+
+    def visit_ExceptHandler(self, node):
+        return self._bind(node, node.name)
+
+    def visit_MatchAs(self, node):
+        return self._bind(node, node.name)
+
+    def visit_MatchStar(self, node):
+        return self._bind(node, node.name)
+
+    def _reject(self, node):
+        raise ValueError(f"Blocked unsafe construct in code: {type(node).__name__}")
+
+    # Generators and coroutines carry live frames (gi_frame / cr_frame); nothing generated needs them.
+    visit_GeneratorExp = visit_Yield = visit_YieldFrom = visit_Await = _reject
+    visit_AsyncFunctionDef = visit_AsyncFor = visit_AsyncWith = _reject
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr in TEXT_EXPORTS:
+            if node.args or any(k.arg is None or k.arg in DESTINATION_KEYWORDS for k in node.keywords):
+                raise ValueError(f"Blocked unsafe attribute in code: .{func.attr} with a path or buffer")
+            self._checked_calls.add(id(func))
+        elif isinstance(func, ast.Attribute) and func.attr in EXPRESSION_METHODS:
+            _check_expression(node)
+            self._checked_calls.add(id(func))
+        return self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        if not _attribute_allowed(node.attr):
+            raise ValueError(f"Blocked unsafe attribute in code: .{node.attr}")
+        if (node.attr in TEXT_EXPORTS or node.attr in EXPRESSION_METHODS) and id(node) not in self._checked_calls:
+            # Only direct calls are checked, so the method itself can't be passed around.
+            raise ValueError(f"Blocked unsafe attribute in code: .{node.attr} outside a direct call")
+        module = _sandbox_module(node.value)
+        if (module is not None and node.attr not in SAFE_SUBMODULES
+                and isinstance(getattr(module, node.attr, None), types.ModuleType)):
+            raise ValueError(f"Blocked unsafe module in code: .{node.attr}")
+        return self.generic_visit(node)
+
+    def visit_While(self, node):
+        if isinstance(node.test, ast.Constant) and node.test.value:
+            raise ValueError("Blocked unsafe keyword in code: while True")
+        return self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        self.generic_visit(node)
+        if not (isinstance(node.ctx, ast.Load) and isinstance(node.slice, ast.Constant) and node.slice.value == 0):
+            return node
+        value = node.value
+        # x.iloc[0] -> x.pipe(safe_get_first)
+        if isinstance(value, ast.Attribute) and value.attr == "iloc":
+            self.rewrote = True
+            pipe = ast.Attribute(value=value.value, attr="pipe", ctx=ast.Load())
+            return ast.copy_location(
+                ast.Call(func=pipe, args=[ast.Name(id="safe_get_first", ctx=ast.Load())], keywords=[]), node
+            )
+        # x.unique()[0] -> safe_get_first(x.unique())
+        if (isinstance(value, ast.Call) and isinstance(value.func, ast.Attribute)
+                and value.func.attr == "unique" and not value.args and not value.keywords):
+            self.rewrote = True
+            return ast.copy_location(
+                ast.Call(func=ast.Name(id="safe_get_first", ctx=ast.Load()), args=[value], keywords=[]), node
+            )
+        return node
+
+
+_BACKTICKED = re.compile(r"`[^`]*`")
+
+
+def _check_expression(call: ast.Call):
+    """
+    The expression string of an `.eval(...)` / `.query(...)` call must be a
+    literal that passes the same policy as the code around it (pandas syntax:
+    backticked column names and `@variables` are normalized before parsing).
+    """
+    expr = call.args[0] if call.args else next((k.value for k in call.keywords if k.arg == "expr"), None)
+    if not (isinstance(expr, ast.Constant) and isinstance(expr.value, str)):
+        raise ValueError(f"Blocked unsafe expression in code: .{call.func.attr} needs a literal string")
+    text = _BACKTICKED.sub("col", expr.value).replace("@", "")
+    try:
+        tree = ast.parse(textwrap.dedent(text).strip(), mode="exec")
+    except SyntaxError:
+        raise ValueError(f"Blocked unsafe expression in code: {expr.value!r}") from None
+    _SandboxTransformer().visit(tree)
+
+
+def _sanitize_tree(code: str) -> ast.Module:
+    tree = ast.parse(textwrap.dedent(code.replace("```", "")), filename=SANDBOX_FILENAME)
+    transformer = _SandboxTransformer()
+    tree = transformer.visit(tree)
+    if transformer.rewrote:
+        ast.fix_missing_locations(tree)
+
+    unknown = transformer.loaded - transformer.bound - SANDBOX_GLOBALS - SANDBOX_BUILTINS.keys()
+    if unknown:
+        raise ValueError(f"Blocked unsafe name in code: {sorted(unknown)[0]}")
+    return tree
+
+
+@functools.lru_cache(maxsize=256)
+def compile_sandboxed(code: str) -> bytes:
+    """
+    Validates and rewrites `code`, then returns its compiled code object marshalled
+    for the sandbox worker. Results are cached by source, so repeated or overridden
+    code is parsed only once. Raises ValueError (policy) or SyntaxError.
+    """
+    return marshal.dumps(compile(_sanitize_tree(code), SANDBOX_FILENAME, "exec"))
+
+
 def sanitize_code(code: str) -> str:
-    """Removes unsafe imports/keywords and applies robust fixes for unsafe indexing."""
-    # 1. Remove standard imports and markdown
-    code = re.sub(r'^\s*import\s+[^\n]+', '', code, flags=re.MULTILINE)
-    code = re.sub(r'^\s*from\s+[^\n]+\s+import\s+[^\n]+', '', code, flags=re.MULTILINE)
-    code = re.sub(r'```', '', code)
-
-    # 2. Check for forbidden keywords
-    for kw in FORBIDDEN_KEYWORDS:
-        if kw in code:
-            raise ValueError(f"Blocked unsafe keyword in code: {kw}")
-
-    # 3. Apply robust line-by-line fixes for unsafe indexing
-    fixed_lines = []
-    for line in code.splitlines():
-        # Fix for .iloc[0]
-        if ".iloc[0]" in line:
-            line = line.replace(".iloc[0]", ".pipe(safe_get_first)")
-        
-        # Fix for .unique()[0]
-        if ".unique()[0]" in line:
-            # Handle assignments correctly by splitting the line
-            if "=" in line:
-                parts = line.split("=", 1)
-                variable_part = parts[0].strip()
-                expression_part = parts[1].strip().replace(".unique()[0]", ".unique()")
-                line = f"{variable_part} = safe_get_first({expression_part})"
-            else:
-                expression_part = line.strip().replace(".unique()[0]", ".unique()")
-                line = f"result = safe_get_first({expression_part})"
-        fixed_lines.append(line)
-    
-    return "\n".join(fixed_lines)
-
-
-def _worker(code_to_run, df, return_dict):
-    """The function that runs in a separate process to execute code safely."""
+    """Returns the validated, rewritten source that the sandbox will run."""
+    return ast.unparse(_sanitize_tree(code))
+
+
+# --- Figures ---
+class FigureImage:
+    """A figure rendered inside the sandbox: PNG bytes plus the metadata needed to show or export it."""
+
+    def __init__(self, png: bytes, width: float, height: float, dpi: float, title: str = ""):
+        self.png = png
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.title = title
+
+    @classmethod
+    def from_figure(cls, fig, dpi: float = 100):
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=dpi)
+        width, height = fig.get_size_inches()
+        if hasattr(fig, "get_suptitle"):
+            titles = [fig.get_suptitle()]
+        else:  # matplotlib < 3.8 has no public accessor
+            suptitle = getattr(fig, "_suptitle", None)
+            titles = [suptitle.get_text()] if suptitle is not None else []
+        titles += [ax.get_title() for ax in fig.axes]
+        return cls(buf.getvalue(), float(width), float(height), dpi, next((t for t in titles if t), ""))
+
+
+# --- Sandbox worker pool ---
+CANCEL_POLL_INTERVAL = 0.1  # seconds between cancellation checks while a job runs
+# Returned when a worker can't attach a shared frame; execute_code republishes and retries once.
+DATASET_UNAVAILABLE = "Shared dataset was released before the sandbox could attach it."
+
+
+def _run_job(code_to_run, df):
+    """Executes one job in fresh globals and returns its payload dict."""
     local_env = {
-        "__builtins__": {"len": len, "min": min, "max": max, "sum": sum, "sorted": sorted, "range": range, "print": print, "round": round, "enumerate": enumerate, "abs": abs, "zip": zip, "str": str, "int": int, "float": float, "bool": bool, "list": list, "dict": dict},
-        "pd": pd, "np": np, "plt": plt, "df": df, "safe_get_first": safe_get_first, "result": None
+        "__builtins__": SANDBOX_BUILTINS,
+        **SANDBOX_MODULE_PROXIES, "df": df, "safe_get_first": safe_get_first, "result": None
     }
-    
+
+    if isinstance(code_to_run, bytes):
+        code_to_run = marshal.loads(code_to_run)
+
     plt.close("all")
     buf = io.StringIO()
     try:
         with redirect_stdout(buf):
             exec(code_to_run, local_env)
     except Exception:
-        return_dict["error"] = traceback.format_exc()
-        return
+        return {"result": None, "figs": None, "error": traceback.format_exc()}
 
     stdout = buf.getvalue().strip()
     result = local_env.get("result", None)
@@ -81,30 +344,322 @@ def _worker(code_to_run, df, return_dict):
     if result is None and stdout:
         result = stdout
 
-    figs = [plt.figure(fid) for fid in plt.get_fignums()]
+    figs = [FigureImage.from_figure(plt.figure(fid)) for fid in plt.get_fignums()]
+    plt.close("all")
+    return {"result": result, "figs": figs, "error": None}
+
+
+def _warm_up():
+    """Touches the heavy code paths once so the first real job doesn't pay for them."""
+    fig = plt.figure()
+    pd.DataFrame({"x": np.arange(3)}).plot(ax=fig.gca())
+    fig.canvas.draw()
+    plt.close("all")
+
+
+def _worker_loop(conn):
+    """Runs in a pooled process, serving jobs from the parent until told to stop."""
+    if int(pd.__version__.split(".")[0]) < 3:
+        # Shared frames are read-only; copy-on-write lets generated code mutate its own view.
+        pd.set_option("mode.copy_on_write", True)
+    # Generated code tends to scatter every row; on big frames draw a labelled sample instead.
+    from core.visuals import install_sampled_scatter
+    install_sampled_scatter()
+    _warm_up()
+    attached = OrderedDict()
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+
+        code_to_run, data = job
+        if isinstance(data, SharedFrameHandle):
+            try:
+                frame = attached.pop(data.name, None) or AttachedFrame(data)
+            except Exception:
+                conn.send({"result": None, "figs": None, "error": DATASET_UNAVAILABLE,
+                           "detail": traceback.format_exc()})
+                continue
+            attached[data.name] = frame
+            while len(attached) > MAX_PUBLISHED_DATASETS:
+                attached.popitem(last=False)[1].close()
+            data = frame.view()
+
+        payload = _run_job(code_to_run, data)
+        try:
+            conn.send(payload)
+        except Exception:
+            # The result itself could not be pickled back to the parent.
+            conn.send({"result": None, "figs": None, "error": traceback.format_exc()})
+        del data, payload
+
+    data = payload = None
+    gc.collect()
+    for frame in attached.values():
+        frame.close()
+
+
+class SandboxWorker:
+    """A single pre-warmed sandbox process talking to the parent over a pipe."""
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_loop, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(1)
+        self.kill()
+
+
+class SandboxPool:
+    """
+    Persistent pool of sandbox worker processes.
+
+    Every job still runs in fresh globals; a worker is recycled after
+    `max_jobs_per_worker` jobs, and killed and replaced when a job times out.
+    """
+
+    def __init__(self, size: int = 2, max_jobs_per_worker: int = 50):
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._ctx = multiprocessing.get_context()
+        # Workers must share the parent's tracker, or a retired worker would unlink live shared frames.
+        resource_tracker.ensure_running()
+        self._idle = []
+        self._busy = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def warm(self):
+        """Starts idle workers up to the pool size."""
+        with self._cond:
+            while len(self._idle) + self._busy < self.size:
+                self._idle.append(SandboxWorker(self._ctx))
+
+    def _acquire(self) -> SandboxWorker:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Sandbox pool is shut down.")
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.is_alive():
+                        self._busy += 1
+                        return worker
+                    worker.kill()
+                if self._busy < self.size:
+                    self._busy += 1
+                    break
+                self._cond.wait()
+        try:
+            return SandboxWorker(self._ctx)
+        except Exception:
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker: SandboxWorker, healthy: bool):
+        worker.jobs += 1
+        if not healthy or worker.jobs >= self.max_jobs_per_worker:
+            worker.kill()
+            worker = None
+        with self._cond:
+            self._busy -= 1
+            if worker is not None and not self._closed:
+                self._idle.append(worker)
+            elif worker is not None:
+                worker.stop()
+            self._cond.notify()
+        if worker is None and not self._closed:
+            # Replace the retired worker so the next call finds a warm one.
+            self.warm()
+
+    def run(self, code_to_run: str, data, timeout: int, cancel_event=None):
+        """
+        Runs one job against a DataFrame or SharedFrameHandle and returns (result, figs, error).
+        Setting `cancel_event` while it runs kills the worker, like a timeout.
+        """
+        worker = self._acquire()
+        try:
+            worker.conn.send((code_to_run, data))
+            outcome = self._wait(worker, timeout, cancel_event)
+            if outcome:
+                self._release(worker, healthy=False)
+                return None, None, outcome
+            payload = worker.conn.recv()
+        except (EOFError, OSError, BrokenPipeError):
+            self._release(worker, healthy=False)
+            return None, None, "Sandbox worker exited unexpectedly."
+        except Exception:
+            self._release(worker, healthy=False)
+            raise
+
+        self._release(worker, healthy=True)
+        return payload.get("result"), payload.get("figs"), payload.get("error")
+
+    @staticmethod
+    def _wait(worker: SandboxWorker, timeout: float, cancel_event=None):
+        """Waits for the worker's reply; returns None when it is ready, else the error to report."""
+        if cancel_event is None:
+            return None if worker.conn.poll(timeout) else "Execution timed out."
+        deadline = time.monotonic() + timeout
+        while not worker.conn.poll(min(CANCEL_POLL_INTERVAL, max(0.0, deadline - time.monotonic()))):
+            if cancel_event.is_set():
+                return "Execution cancelled."
+            if time.monotonic() >= deadline:
+                return "Execution timed out."
+        return None
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for worker in idle:
+            worker.stop()
+
+
+# Enough workers for one analyze + visualize + summarize fan-out to run side by side.
+SANDBOX_WORKERS = 3
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Returns the process-wide sandbox pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(size=SANDBOX_WORKERS)
+            _pool.warm()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+# --- Shared datasets ---
+MAX_PUBLISHED_DATASETS = 2
+
+
+class _Published:
+    """A published frame, the DataFrame it was made from, and how many runs are using it."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.shared = SharedFrame(df)
+        self.ref = weakref.ref(df)
+        self.pins = 0
+
+
+_published = OrderedDict()   # dataset_id -> _Published, oldest first
+_retired = []                # replaced or evicted entries still pinned by a run
+_published_lock = threading.Lock()
 
-    return_dict["result"] = result
-    return_dict["figs"] = figs
-    return_dict["error"] = None
 
+def _publish(dataset_id: str, df: pd.DataFrame, fresh: bool = False) -> _Published:
+    entry = _published.pop(dataset_id, None)
+    if entry is not None and (fresh or entry.ref() is not df):
+        _retired.append(entry)
+        entry = None
+    if entry is None:
+        entry = _Published(df)
+    _published[dataset_id] = entry
+    return entry
 
-def execute_code(code: str, df: pd.DataFrame, timeout: int = 15):
-    """Safely execute Python code with the dataframe in a separate process."""
+
+def _release_unused():
+    """Releases retired entries nobody runs on, then evicts the oldest unpinned ones over the limit."""
+    for entry in [e for e in _retired if e.pins == 0]:
+        _retired.remove(entry)
+        entry.shared.release()
+    for dataset_id in list(_published):
+        if len(_published) <= MAX_PUBLISHED_DATASETS:
+            break
+        entry = _published[dataset_id]
+        if entry.pins == 0:
+            del _published[dataset_id]
+            entry.shared.release()
+
+
+def publish_dataset(dataset_id: str, df: pd.DataFrame) -> SharedFrameHandle:
+    """
+    Publishes `df` into shared memory under `dataset_id`, once per DataFrame object.
+    Only the last few datasets stay published; older segments are released once
+    no run is using them (see pinned_dataset).
+    """
+    with _published_lock:
+        entry = _publish(dataset_id, df)
+        _release_unused()
+        return entry.shared.handle
+
+
+@contextlib.contextmanager
+def pinned_dataset(dataset_id: str, df: pd.DataFrame, fresh: bool = False):
+    """Publishes `df` and keeps its segment alive until the block exits; yields the handle."""
+    with _published_lock:
+        entry = _publish(dataset_id, df, fresh)
+        entry.pins += 1
+        _release_unused()
     try:
-        code_to_run = sanitize_code(code)
-    except ValueError as e:
-        return None, None, str(e)
+        yield entry.shared.handle
+    finally:
+        with _published_lock:
+            entry.pins -= 1
+            _release_unused()
 
-    manager = multiprocessing.Manager()
-    return_dict = manager.dict()
 
-    p = multiprocessing.Process(target=_worker, args=(code_to_run, df, return_dict))
-    p.start()
-    p.join(timeout)
+def release_datasets():
+    with _published_lock:
+        while _published:
+            _published.popitem()[1].shared.release()
+        while _retired:
+            _retired.pop().shared.release()
+
+
+atexit.register(release_datasets)
+
+
+def execute_code(code: str, df: pd.DataFrame, timeout: int = 15, dataset_id: str | None = None,
+                 cancel_event=None):
+    """
+    Safely execute Python code with the dataframe in a pooled sandbox process.
+    With a `dataset_id` the frame is handed over through shared memory instead of being pickled.
+    Setting `cancel_event` (a threading.Event) stops the run by killing its worker.
+    """
+    try:
+        code_to_run = compile_sandboxed(code)
+    except ValueError as e:
+        return None, None, str(e)
+    except SyntaxError as e:
+        return None, None, "".join(traceback.format_exception_only(e))
 
-    if p.is_alive():
-        p.terminate()
-        p.join()
-        return None, None, "Execution timed out."
+    pool = get_sandbox_pool()
+    if not dataset_id:
+        return pool.run(code_to_run, df, timeout, cancel_event)
+    with pinned_dataset(dataset_id, df) as handle:
+        outcome = pool.run(code_to_run, handle, timeout, cancel_event)
+    if outcome[2] == DATASET_UNAVAILABLE:
+        # The segment vanished under the worker (e.g. released at exit); republish once.
+        with pinned_dataset(dataset_id, df, fresh=True) as handle:
+            outcome = pool.run(code_to_run, handle, timeout, cancel_event)
+    return outcome
 
-    return return_dict.get("result"), return_dict.get("figs"), return_dict.get("error")
\ No newline at end of file
@@ -12,17 +12,20 @@ def export_csv(df, label="Download CSV", file_name="dataset_export.csv"):
         help="Download your dataset as a CSV file."
     )
 
-def export_plots(figs):
-    import matplotlib.pyplot as plt
+def figure_png(fig) -> bytes:
+    """PNG bytes for a sandbox FigureImage (already rendered) or a live matplotlib Figure."""
+    if hasattr(fig, "png"):
+        return fig.png
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
 
+def export_plots(figs):
     if figs:
         for i, fig in enumerate(figs):
-            buf = io.BytesIO()
-            fig.savefig(buf, format='png')
-            buf.seek(0)
             st.download_button(
                 label=f"Download Plot {i+1} as PNG",
-                data=buf,
+                data=figure_png(fig),
                 file_name=f"plot_{i+1}.png",
                 mime="image/png"
             )
@@ -42,10 +45,7 @@ def export_pdf(df, summary_text, figs=None, file_name="dataset_report.pdf"):
     # Add plots if any
     if figs:
         for fig in figs:
-            img_buf = io.BytesIO()
-            fig.savefig(img_buf, format='png')
-            img_buf.seek(0)
-            elements.append(Image(img_buf))
+            elements.append(Image(io.BytesIO(figure_png(fig))))
             elements.append(Spacer(1, 12))
 
     doc.build(elements)
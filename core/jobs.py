@@ -0,0 +1,191 @@
+# core/jobs.py
+"""
+Background jobs for long-running work (LLM generation, sandbox runs,
+summaries, profiling reports), so a Streamlit rerun never throws work away.
+
+Jobs run on a process-wide thread pool (sandboxed code still runs in the
+sandbox worker processes). A session keeps only job ids; the script polls
+the job, and a rerun while it runs finds the same job instead of submitting
+it again. Sessions asking for the same work share one job, which only stops
+once every session that asked for it has cancelled. Finished jobs are kept
+by id for a while, so their results outlive reruns too.
+"""
+import time
+import uuid
+import atexit
+import logging
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = 4
+MAX_FINISHED_JOBS = 200
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = frozenset({DONE, FAILED, CANCELLED})
+
+
+class JobCancelled(Exception):
+    """Raised inside a job (see Job.check) once it has been cancelled."""
+
+
+class Job:
+    """
+    One submitted unit of work. The function it runs receives the Job as its
+    first argument, to report progress and to see cancellation: `cancel_event`
+    can be handed to execute_code/run_cached, which kill the sandbox worker.
+    """
+
+    def __init__(self, job_id: str, label: str = "", key: str = None, owner: str = None):
+        self.id = job_id
+        self.label = label
+        self.key = key
+        self.owners = {owner}   # sessions waiting for the result (see JobManager.cancel)
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.progress = ""      # latest status message
+        self.fraction = None    # 0..1 once the job can tell how far along it is
+        self.output = ""        # partial output so far (e.g. streamed code)
+        self.partials = {}      # finished sub-results of a fan-out job, by name, as they arrive
+        self.cancel_event = threading.Event()
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def check(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def report(self, message: str = None, fraction: float = None, output: str = None):
+        """Updates what polling shows (status, fraction done, partial output); raises JobCancelled once cancelled."""
+        if message is not None:
+            self.progress = message
+        if fraction is not None:
+            self.fraction = fraction
+        if output is not None:
+            self.output = output
+        self.check()
+
+
+class JobManager:
+    """
+    Runs jobs on a thread pool and keeps them by id.
+
+    Submitting with a `key` (e.g. a hash of query, mode and dataset version)
+    returns the job for that key while it is still queued or running, so the
+    same request is never computed twice at the same time; once it finished,
+    the same key starts a fresh job. Each submitter (`owner`, e.g. the
+    Streamlit session id) holds the shared job until it cancels.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, label: str = "", key: str = None, owner: str = None, **kwargs) -> str:
+        """Queues `fn(job, *args, **kwargs)` and returns the job id."""
+        with self._lock:
+            existing = self._by_key.get(key) if key else None
+            if existing is not None and not existing.done and not existing.cancelled:
+                existing.owners.add(owner)
+                return existing.id
+            job = Job(uuid.uuid4().hex, label, key, owner)
+            self._jobs[job.id] = job
+            if key:
+                self._by_key[key] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job: Job, fn, args, kwargs):
+        if job.cancelled:
+            job.status, job.finished = CANCELLED, time.time()
+            return
+        job.status, job.started = RUNNING, time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = CANCELLED if job.cancelled else DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception:
+            job.error = traceback.format_exc()
+            job.status = FAILED
+            logger.error("Job %s (%s) failed:\n%s", job.id, job.label, job.error)
+        finally:
+            job.finished = time.time()
+            logger.info("Job %s (%s) %s in %.2fs", job.id, job.label, job.status, job.elapsed)
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.id]
+            if job.key and self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str, owner: str = None) -> bool:
+        """
+        Withdraws `owner` from a job; once no owner is left the job is asked to
+        stop and a running sandbox execution is killed. Returns True only if
+        the job was actually cancelled.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return False
+            job.owners.discard(owner)
+            if job.owners:
+                return False
+            job.cancel_event.set()
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Returns the process-wide job manager, shared by every session."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+            atexit.register(_manager.shutdown)
+        return _manager
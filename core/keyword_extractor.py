@@ -47,4 +47,16 @@ def select_important_features(df: pd.DataFrame, max_cols: int = 15):
     if not important_cols:
         important_cols = df.columns.tolist()[:max_cols]
         
-    return important_cols[:max_cols]
\ No newline at end of file
+    return important_cols[:max_cols]
+
+
+def column_importance(df: pd.DataFrame) -> pd.Series:
+    """
+    Scores every column in [0, 1] by its position in select_important_features'
+    ranking (first pick = 1.0); columns it would never pick score 0.
+    """
+    ranked = select_important_features(df, max_cols=len(df.columns))
+    scores = pd.Series(0.0, index=df.columns)
+    for i, col in enumerate(ranked):
+        scores[col] = 1.0 - i / len(ranked)
+    return scores
@@ -1,13 +1,29 @@
 # core/llm_client.py
 import re
+import time
+import asyncio
+import logging
 import streamlit as st
-from core.prompt_builder import build_prompt
+from core.prompt_builder import build_messages, estimate_tokens, DEFAULT_TOKEN_BUDGET
+from utils.disk_cache import DiskLRUCache, cache_key
 
+logger = logging.getLogger(__name__)
+
+# Generated code keyed by (normalized query, mode, model, schema + profile hash).
+CODE_CACHE = DiskLRUCache("llm_code", max_entries=500)
+
+# Keep the model (and its prompt cache) loaded between questions. A fixed context size
+# matters too: Ollama reloads the model, dropping the cache, when num_ctx changes.
+LLM_KEEP_ALIVE = "30m"
+LLM_NUM_CTX = 8192
+
+@st.cache_resource(show_spinner=False)
 def get_llm(model_name: str = "llama3.2:3b", temperature: float = 0.0):
-    """Initializes and returns the ChatOllama instance."""
+    """Initializes and returns the ChatOllama instance, shared across reruns and sessions."""
     try:
         from langchain_ollama import ChatOllama
-        return ChatOllama(model=model_name, temperature=temperature)
+        return ChatOllama(model=model_name, temperature=temperature,
+                          keep_alive=LLM_KEEP_ALIVE, num_ctx=LLM_NUM_CTX)
     except ImportError:
         st.error("ChatOllama client not found. Please run: pip install langchain-ollama")
         st.stop()
@@ -21,24 +37,138 @@ def extract_code(text: str) -> str:
     match = re.search(r"```(?:python)?\s*([\s\S]*?)```", text)
     return match.group(1).strip() if match else text.strip()
 
+def _message_text(message) -> str:
+    """String content of a LangChain message/chunk, or its str() for other response structures."""
+    if hasattr(message, 'content') and isinstance(message.content, str):
+        return message.content
+    return str(message)
+
+def partial_code(text: str) -> str:
+    """The code written so far in a streamed response, for live display."""
+    start = text.find("```")
+    if start == -1:
+        return text
+    body = text[start + 3:]
+    first_line, newline, rest = body.partition("\n")
+    if not first_line.strip() or first_line.strip().isalnum():
+        # Language tag ("python"), possibly still arriving.
+        body = rest if newline else ""
+    return body.split("```", 1)[0]
+
+def stream_completion(llm, prompt, on_token=None) -> str:
+    """
+    Streams the completion, calling `on_token(text_so_far)` per chunk, and stops
+    as soon as the first fenced code block is closed; anything the model would
+    write after it is never generated.
+    """
+    text = ""
+    stream = llm.stream(prompt)
+    try:
+        for chunk in stream:
+            text += _message_text(chunk)
+            if on_token:
+                on_token(text)
+            if text.count("```") >= 2:
+                break
+    finally:
+        # Closing the generator drops the HTTP stream, which makes Ollama stop generating.
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    return text
+
+async def astream_completion(llm, prompt, on_token=None) -> str:
+    """Async stream_completion: same early stop, for generations issued concurrently."""
+    text = ""
+    stream = llm.astream(prompt)
+    try:
+        async for chunk in stream:
+            text += _message_text(chunk)
+            if on_token:
+                on_token(text)
+            if text.count("```") >= 2:
+                break
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose:
+            await aclose()
+    return text
+
+def normalize_query(user_query: str) -> str:
+    return " ".join(user_query.lower().split())
+
+def code_cache_key(df, user_query, mode: str, model_name: str, profiling_summary: str) -> str:
+    """Cache key for generated code; any change to the dataset's columns or profile changes it."""
+    columns = "|".join(f"{col}:{dtype}" for col, dtype in df.dtypes.items())
+    return cache_key(normalize_query(user_query), mode, model_name, cache_key(columns, profiling_summary))
+
+def _model_name(llm) -> str:
+    return getattr(llm, "model", type(llm).__name__)
+
+def _generation_prompt(llm, df, user_query, mode, profiling_summary, use_cache, profile, token_budget):
+    """Shared first half of (a)generate_python_code: (cached code, None) on a cache hit, else (None, messages)."""
+    if use_cache:
+        cached = cached_code(llm, df, user_query, mode, profiling_summary)
+        if cached is not None:
+            return cached, None
+    return None, build_messages(df, user_query, mode, profiling_summary, profile=profile, token_budget=token_budget)
+
+def _finish_generation(prompt, response_text: str, start: float, label: str) -> str:
+    """Shared second half: logs the prompt size and latency, returns the extracted code."""
+    logger.info("LLM generation (%s): ~%d prompt tokens, %.2fs",
+                label, sum(estimate_tokens(text) for _, text in prompt), time.perf_counter() - start)
+    return extract_code(response_text)
+
 # --- UPDATED FUNCTION ---
-def generate_python_code(llm, df, user_query, mode: str, profiling_summary: str) -> str:
+def generate_python_code(llm, df, user_query, mode: str, profiling_summary: str, use_cache: bool = True,
+                         profile=None, on_token=None, token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
     """
     Generates Python code via LLM and correctly extracts the text content
-    from the response object before parsing.
+    from the response object before parsing. Identical requests on the same
+    dataset are answered from CODE_CACHE without calling the model; code
+    only goes into the cache once it ran successfully (see remember_code).
+    Models that support streaming are streamed (see stream_completion). The
+    prompt goes out as a per-dataset system message plus the question, so
+    Ollama can reuse the cached prefix (see build_prompt_parts).
+    """
+    cached, prompt = _generation_prompt(llm, df, user_query, mode, profiling_summary, use_cache, profile,
+                                        token_budget)
+    if cached is not None:
+        return cached
+
+    start = time.perf_counter()
+    if hasattr(llm, "stream"):
+        response_text = stream_completion(llm, prompt, on_token)
+    else:
+        # The llm.invoke() method returns a message object, not a raw string.
+        response_text = _message_text(llm.invoke(prompt))
+    return _finish_generation(prompt, response_text, start, mode)
+
+async def agenerate_python_code(llm, df, user_query, mode: str, profiling_summary: str, use_cache: bool = True,
+                                profile=None, on_token=None, token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """
+    generate_python_code as a coroutine, so several generations (e.g. the
+    analyze/visualize/summarize fan-out) can be in flight at once. Only the
+    model call differs; the cache lookup, prompt and code extraction are shared.
     """
-    prompt = build_prompt(df, user_query, mode, profiling_summary)
-    
-    # The llm.invoke() method returns a message object, not a raw string.
-    response_obj = llm.invoke(prompt)
-    
-    # We must extract the string content from the object before processing.
-    # The content is usually in the .content attribute.
-    if hasattr(response_obj, 'content') and isinstance(response_obj.content, str):
-        response_text = response_obj.content
+    cached, prompt = _generation_prompt(llm, df, user_query, mode, profiling_summary, use_cache, profile,
+                                        token_budget)
+    if cached is not None:
+        return cached
+
+    start = time.perf_counter()
+    if hasattr(llm, "astream"):
+        response_text = await astream_completion(llm, prompt, on_token)
+    elif hasattr(llm, "ainvoke"):
+        response_text = _message_text(await llm.ainvoke(prompt))
     else:
-        # Fallback for other possible response structures
-        response_text = str(response_obj)
-        
-    # Now, we pass the guaranteed string to extract_code.
-    return extract_code(response_text)
\ No newline at end of file
+        response_text = _message_text(await asyncio.to_thread(llm.invoke, prompt))
+    return _finish_generation(prompt, response_text, start, f"{mode}, async")
+
+def cached_code(llm, df, user_query, mode: str, profiling_summary: str):
+    """Code already generated for exactly this request (see code_cache_key), or None."""
+    return CODE_CACHE.get(code_cache_key(df, user_query, mode, _model_name(llm), profiling_summary))
+
+def remember_code(llm, df, user_query, mode: str, profiling_summary: str, code: str):
+    """Caches the code for a request once it ran successfully (possibly after self-repair)."""
+    CODE_CACHE.set(code_cache_key(df, user_query, mode, _model_name(llm), profiling_summary), code)
\ No newline at end of file
@@ -1,18 +1,149 @@
 import re
+import functools
 import pandas as pd
-import matplotlib.pyplot as plt
+
+from core.executor import compile_sandboxed
+
+ALL_MODES = frozenset({"analyze", "summarize", "visualize"})
+
+
+class OverrideRule:
+    """
+    A deterministic answer for a common query.
+
+    `terms` is a list of groups of lowercase substrings: the rule fires when the
+    query contains at least one term of every group. `requires` lists columns
+    the template needs, as exact names or compiled regexes searched in the
+    column names. The template is validated and compiled for the sandbox when
+    the rule is registered.
+    """
+
+    def __init__(self, name: str, terms, template: str, modes=ALL_MODES, requires=()):
+        self.name = name
+        self.terms = [tuple(group) for group in terms]
+        self.template = template
+        self.modes = frozenset(modes)
+        self.requires = tuple(requires)
+        compile_sandboxed(template)  # raises ValueError/SyntaxError for a bad template
+
+    def applies_to(self, columns) -> bool:
+        for req in self.requires:
+            if isinstance(req, str):
+                if req not in columns:
+                    return False
+            elif not any(req.search(str(col)) for col in columns):
+                return False
+        return True
+
+
+def _trie_pattern(terms) -> str:
+    """
+    Regex matching any of `terms`, factored by common prefix so the regex engine
+    walks one character trie instead of trying every term. Optional tails are
+    greedy, so the longest term starting at a position wins.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class OverrideRouter:
+    """
+    Matches a query against every registered rule with one regex scan.
+
+    All rule terms are compiled into a single lookahead pattern (a prefix trie,
+    longest term first), so each position of the query reports the longest
+    term starting there; a precomputed closure adds the shorter terms contained
+    in it. Only rules indexed under a term that was found are checked, so
+    matching cost grows with the query, not with the number of rules.
+    """
+
+    def __init__(self):
+        self.rules = []
+        self._matcher = None
+
+    def register(self, rule: OverrideRule) -> OverrideRule:
+        self.rules.append(rule)
+        self._matcher = None
+        self._applicable.cache_clear()
+        return rule
+
+    def _compile(self):
+        terms = {t for rule in self.rules for group in rule.terms for t in group}
+        pattern = re.compile(f"(?=({_trie_pattern(terms)}))") if terms else None
+        closure = {t: frozenset(s for s in terms if s in t) for t in terms}
+        by_term = {}
+        for i, rule in enumerate(self.rules):
+            for t in rule.terms[0]:
+                by_term.setdefault(t, []).append(i)
+        self._matcher = (pattern, closure, by_term)
+        return self._matcher
+
+    @functools.lru_cache(maxsize=32)
+    def _applicable(self, columns: tuple) -> frozenset:
+        """Indices of rules whose required columns exist; computed once per column set."""
+        return frozenset(i for i, rule in enumerate(self.rules) if rule.applies_to(columns))
+
+    def match(self, user_query: str, df: pd.DataFrame, mode: str):
+        """Returns the first registered rule matching the query, mode and columns, else None."""
+        pattern, closure, by_term = self._matcher or self._compile()
+        if pattern is None:
+            return None
+        q = user_query.lower().strip()
+        found = set()
+        for m in pattern.finditer(q):
+            found |= closure[m.group(1)]
+        if not found:
+            return None
+
+        applicable = self._applicable(tuple(df.columns))
+        candidates = sorted({i for t in found for i in by_term.get(t, ())})
+        for i in candidates:
+            rule = self.rules[i]
+            if (i in applicable and mode in rule.modes
+                    and all(any(t in found for t in group) for group in rule.terms)):
+                return rule
+        return None
+
+
+ROUTER = OverrideRouter()
+
+
+def register_rule(name: str, terms, template: str, modes=ALL_MODES, requires=()) -> OverrideRule:
+    """Adds a deterministic override; see OverrideRule for the fields."""
+    return ROUTER.register(OverrideRule(name, terms, template, modes, requires))
+
+
+def match_override(user_query: str, df: pd.DataFrame, mode: str):
+    return ROUTER.match(user_query, df, mode)
+
 
 def intent_override(user_query: str, df: pd.DataFrame, mode: str) -> str | None:
     """
     Deterministic overrides for very common / high-value cricket queries.
     Returns a Python code string (to be executed in executor).
     """
+    rule = ROUTER.match(user_query, df, mode)
+    return rule.template if rule else None
 
-    q = user_query.lower().strip()
 
-    # ------------------- Batting / Toss -------------------
-    if ("bat" in q and "first" in q and "most" in q) and mode == "visualize":
-        return """
+# ------------------- Batting / Toss -------------------
+register_rule(
+    "bat_first_most", [("bat",), ("first",), ("most",)], modes={"visualize"},
+    requires=("Toss Decision", "Toss Winner"),
+    template="""
 # Count how many times each toss winner chose to bat
 bat_first = df[df['Toss Decision'].str.contains('bat', case=False, na=False)]['Toss Winner'].value_counts().sort_values(ascending=False)
 plt.figure(figsize=(10,6))
@@ -27,151 +158,140 @@ if len(bat_first) > 0:
     result = f"The team that chose to bat first most often is {bat_first.idxmax()} ({bat_first.max()} times)."
 else:
     result = 'No data to determine the team that chose to bat first most.'
-"""
+""")
 
-    # ------------------- Best Batting Stadium -------------------
-    if ("best" in q and "batting" in q and "stadium" in q) and mode in ("summarize", "analyze"):
-        return """
+# ------------------- Best Batting Stadium -------------------
+register_rule(
+    "best_batting_stadium", [("best",), ("batting",), ("stadium",)], modes={"summarize", "analyze"},
+    requires=("Stadium", "Score A", "Score B"),
+    template="""
 # Compute best batting stadium by average combined score across matches
 sd = df.copy()
-sd['Score A'] = pd.to_numeric(sd.get('Score A'), errors='coerce')
-sd['Score B'] = pd.to_numeric(sd.get('Score B'), errors='coerce')
+sd['Score A'] = pd.to_numeric(sd['Score A'], errors='coerce')
+sd['Score B'] = pd.to_numeric(sd['Score B'], errors='coerce')
 sd = sd[~(sd['Score A'].isna() & sd['Score B'].isna())]
-if 'Stadium' in sd.columns:
-    avg_scores = sd.groupby('Stadium')[['Score A', 'Score B']].mean()
-    avg_scores = avg_scores.fillna(0)
-    avg_scores['Total Avg'] = avg_scores['Score A'] + avg_scores['Score B']
-    if not avg_scores.empty:
-        best_stadium = avg_scores['Total Avg'].idxmax()
-        top_score = avg_scores['Total Avg'].max()
-        result = f"The best batting stadium is {best_stadium} with an average combined match score of {top_score:.1f} runs."
-    else:
-        result = "Not enough data to determine the best batting stadium."
+avg_scores = sd.groupby('Stadium')[['Score A', 'Score B']].mean()
+avg_scores = avg_scores.fillna(0)
+avg_scores['Total Avg'] = avg_scores['Score A'] + avg_scores['Score B']
+if not avg_scores.empty:
+    best_stadium = avg_scores['Total Avg'].idxmax()
+    top_score = avg_scores['Total Avg'].max()
+    result = f"The best batting stadium is {best_stadium} with an average combined match score of {top_score:.1f} runs."
 else:
-    result = "Dataset does not include a 'Stadium' column."
-"""
+    result = "Not enough data to determine the best batting stadium."
+""")
 
-    # ------------------- Man of the Match -------------------
-    if ("man of the match" in q or "man of match" in q or "mom" in q) and mode == "visualize":
-        return """
+# ------------------- Man of the Match -------------------
+register_rule(
+    "man_of_the_match", [("man of the match", "man of match", "mom")], modes={"visualize"},
+    requires=("Wining Team", "Man of the Match"),
+    template="""
 # Robust counting of Man of the Match awards by team and player
-if 'Wining Team' in df.columns and 'Man of the Match' in df.columns:
-    mom_counts = df.groupby(['Wining Team', 'Man of the Match']).size().reset_index(name='Awards')
-    if mom_counts.empty:
-        result = "No Man of the Match records found."
-    else:
-        mom_counts['Label'] = mom_counts['Wining Team'].astype(str) + ' - ' + mom_counts['Man of the Match'].astype(str)
-        mom_counts = mom_counts.sort_values('Awards', ascending=False)
-        top_n = 30
-        mom_plot = mom_counts.head(top_n).copy()
-        plt.figure(figsize=(14,6))
-        plt.bar(mom_plot['Label'].astype(str), mom_plot['Awards'], edgecolor='black')
-        plt.xticks(rotation=90, ha='right')
-        plt.ylabel('Number of Man of the Match Awards')
-        plt.xlabel('Team - Player')
-        plt.title('Top Players Receiving Man of the Match Awards (by Team)')
-        plt.tight_layout()
-        plt.show()
-        max_awards = mom_plot['Awards'].max()
-        top_rows = mom_plot[mom_plot['Awards'] == max_awards]
-        tied_players = ", ".join(top_rows['Man of the Match'] + " (" + top_rows['Wining Team'] + ")")
-        result = f"Top: {tied_players} — {max_awards} awards each."
+mom_counts = df.groupby(['Wining Team', 'Man of the Match']).size().reset_index(name='Awards')
+if mom_counts.empty:
+    result = "No Man of the Match records found."
 else:
-    result = "Required columns ('Wining Team' and/or 'Man of the Match') not present in dataset."
-"""
-
-    # ------------------- Best Bowler -------------------
-    if ("best bowler" in q or "top bowler" in q) and mode in ("summarize", "analyze", "visualize"):
-        return """
-# Compute best bowler by wickets taken
-possible_cols = [c for c in df.columns if re.search(r'wickets|wkt', c, flags=re.I)]
-if possible_cols:
-    col = possible_cols[0]
-    bowler_stats = df.groupby('Bowler')[col].sum().sort_values(ascending=False)
-    plt.figure(figsize=(12,6))
-    bowler_stats.head(10).plot(kind='bar', edgecolor='black')
-    plt.title('Top 10 Bowlers by Wickets')
-    plt.ylabel('Wickets')
-    plt.xlabel('Bowler')
-    plt.xticks(rotation=45, ha='right')
+    mom_counts['Label'] = mom_counts['Wining Team'].astype(str) + ' - ' + mom_counts['Man of the Match'].astype(str)
+    mom_counts = mom_counts.sort_values('Awards', ascending=False)
+    top_n = 30
+    mom_plot = mom_counts.head(top_n).copy()
+    plt.figure(figsize=(14,6))
+    plt.bar(mom_plot['Label'].astype(str), mom_plot['Awards'], edgecolor='black')
+    plt.xticks(rotation=90, ha='right')
+    plt.ylabel('Number of Man of the Match Awards')
+    plt.xlabel('Team - Player')
+    plt.title('Top Players Receiving Man of the Match Awards (by Team)')
     plt.tight_layout()
     plt.show()
-    result = f"Best bowler is {bowler_stats.idxmax()} with {bowler_stats.max()} wickets."
-else:
-    result = "Dataset does not contain bowler/wickets information."
-"""
+    max_awards = mom_plot['Awards'].max()
+    top_rows = mom_plot[mom_plot['Awards'] == max_awards]
+    tied_players = ", ".join(top_rows['Man of the Match'] + " (" + top_rows['Wining Team'] + ")")
+    result = f"Top: {tied_players} — {max_awards} awards each."
+""")
 
-    # ------------------- Most Sixes -------------------
-    if ("most sixes" in q or "six hits" in q) and mode in ("summarize", "analyze", "visualize"):
-        return """
+# ------------------- Best Bowler -------------------
+register_rule(
+    "best_bowler", [("best bowler", "top bowler")],
+    requires=("Bowler", re.compile(r"wickets|wkt", re.I)),
+    template="""
+# Compute best bowler by wickets taken
+col = [c for c in df.columns if 'wickets' in str(c).lower() or 'wkt' in str(c).lower()][0]
+bowler_stats = df.groupby('Bowler')[col].sum().sort_values(ascending=False)
+plt.figure(figsize=(12,6))
+bowler_stats.head(10).plot(kind='bar', edgecolor='black')
+plt.title('Top 10 Bowlers by Wickets')
+plt.ylabel('Wickets')
+plt.xlabel('Bowler')
+plt.xticks(rotation=45, ha='right')
+plt.tight_layout()
+plt.show()
+result = f"Best bowler is {bowler_stats.idxmax()} with {bowler_stats.max()} wickets."
+""")
+
+# ------------------- Most Sixes -------------------
+register_rule(
+    "most_sixes", [("most sixes", "six hits")],
+    requires=("Batsman", re.compile(r"six", re.I)),
+    template="""
 # Compute most sixes by player or team
-possible_cols = [c for c in df.columns if re.search(r'sixes|six', c, flags=re.I)]
-if possible_cols:
-    col = possible_cols[0]
-    six_stats = df.groupby('Batsman')[col].sum().sort_values(ascending=False)
-    plt.figure(figsize=(12,6))
-    six_stats.head(10).plot(kind='bar', edgecolor='black')
-    plt.title('Top 10 Six Hitters')
-    plt.ylabel('Sixes')
-    plt.xlabel('Batsman')
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.show()
-    result = f"Player with most sixes: {six_stats.idxmax()} ({six_stats.max()} sixes)."
-else:
-    result = "Dataset does not contain sixes information."
-"""
+col = [c for c in df.columns if 'six' in str(c).lower()][0]
+six_stats = df.groupby('Batsman')[col].sum().sort_values(ascending=False)
+plt.figure(figsize=(12,6))
+six_stats.head(10).plot(kind='bar', edgecolor='black')
+plt.title('Top 10 Six Hitters')
+plt.ylabel('Sixes')
+plt.xlabel('Batsman')
+plt.xticks(rotation=45, ha='right')
+plt.tight_layout()
+plt.show()
+result = f"Player with most sixes: {six_stats.idxmax()} ({six_stats.max()} sixes)."
+""")
 
-    # ------------------- Toss vs Match Win -------------------
-    if ("toss" in q and "win" in q and "match" in q) and mode in ("summarize", "analyze", "visualize"):
-        return """
+# ------------------- Toss vs Match Win -------------------
+register_rule(
+    "toss_vs_match_win", [("toss",), ("win",), ("match",)],
+    requires=("Toss Winner", "Wining Team"),
+    template="""
 # Compare toss winner vs match winner
-if 'Toss Winner' in df.columns and 'Wining Team' in df.columns:
-    correct = (df['Toss Winner'] == df['Wining Team']).sum()
-    total = len(df)
-    plt.figure(figsize=(6,6))
-    plt.bar(['Toss == Match Win','Toss != Match Win'], [correct, total-correct], color=['green','red'], edgecolor='black')
-    plt.title('Toss Winner vs Match Winner')
-    plt.ylabel('Number of Matches')
-    plt.tight_layout()
-    plt.show()
-    pct = correct/total*100 if total>0 else 0
-    result = f"Toss winner won the match {pct:.1f}% of the time."
-else:
-    result = "Dataset does not have Toss Winner or Wining Team columns."
-"""
-    
-    # ------------------- NEW: Total Extras Given -------------------
-    if "extra" in q and ("how many" in q or "total" in q or "show visually" in q):
-        return """
-# Check if the required columns exist in the DataFrame
-if 'Extras A' in df.columns and 'Extras B' in df.columns:
-    # Calculate the total sum of extras for each column
-    total_extras_A = df['Extras A'].sum()
-    total_extras_B = df['Extras B'].sum()
-
-    # Prepare data for plotting
-    teams = ['Extras by Team A', 'Extras by Team B']
-    totals = [total_extras_A, total_extras_B]
-
-    # Create a clean and clear bar chart
-    plt.figure(figsize=(8, 6))
-    bars = plt.bar(teams, totals, color=['#1f77b4', '#ff7f0e'], edgecolor='black')
-    plt.title('Total Extras Conceded by Each Team')
-    plt.ylabel('Total Extra Runs')
-
-    # Add text labels on top of each bar for clarity
-    for bar in bars:
-        yval = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width()/2.0, yval, int(yval), va='bottom', ha='center') 
-    
-    plt.tight_layout()
-    plt.show()
+correct = (df['Toss Winner'] == df['Wining Team']).sum()
+total = len(df)
+plt.figure(figsize=(6,6))
+plt.bar(['Toss == Match Win','Toss != Match Win'], [correct, total-correct], color=['green','red'], edgecolor='black')
+plt.title('Toss Winner vs Match Winner')
+plt.ylabel('Number of Matches')
+plt.tight_layout()
+plt.show()
+pct = correct/total*100 if total>0 else 0
+result = f"Toss winner won the match {pct:.1f}% of the time."
+""")
 
-    # Create a clear, informative summary string for the result
-    result = f"Across all matches, Team A conceded a total of {total_extras_A} extras, and Team B conceded a total of {total_extras_B} extras."
-else:
-    result = "The dataset does not contain the required 'Extras A' and 'Extras B' columns to calculate total extras."
-"""
+# ------------------- NEW: Total Extras Given -------------------
+register_rule(
+    "total_extras", [("extra",), ("how many", "total", "show visually")],
+    requires=("Extras A", "Extras B"),
+    template="""
+# Calculate the total sum of extras for each column
+total_extras_A = df['Extras A'].sum()
+total_extras_B = df['Extras B'].sum()
+
+# Prepare data for plotting
+teams = ['Extras by Team A', 'Extras by Team B']
+totals = [total_extras_A, total_extras_B]
+
+# Create a clean and clear bar chart
+plt.figure(figsize=(8, 6))
+bars = plt.bar(teams, totals, color=['#1f77b4', '#ff7f0e'], edgecolor='black')
+plt.title('Total Extras Conceded by Each Team')
+plt.ylabel('Total Extra Runs')
+
+# Add text labels on top of each bar for clarity
+for bar in bars:
+    yval = bar.get_height()
+    plt.text(bar.get_x() + bar.get_width()/2.0, yval, int(yval), va='bottom', ha='center')
+
+plt.tight_layout()
+plt.show()
 
-    return None
\ No newline at end of file
+# Create a clear, informative summary string for the result
+result = f"Across all matches, Team A conceded a total of {total_extras_A} extras, and Team B conceded a total of {total_extras_B} extras."
+""")
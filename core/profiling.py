@@ -0,0 +1,102 @@
+# core/profiling.py
+"""
+Tiered dataset profiling for the Profiling Report page.
+
+1. quick_profile: per-column table from the cached DatasetProfile plus the
+   data_cleaning diagnosis. Vectorized, typically well under a second.
+2. detailed_report_html: a ydata-profiling report on a row sample, with
+   real progress per stage, its HTML cached on disk by dataset id + settings.
+"""
+import time
+
+import pandas as pd
+
+from core.data_cleaning import diagnose_data
+from core.visuals import sample_rows
+from utils.disk_cache import DiskLRUCache, cache_key
+from utils.schema import get_dataset_profile
+
+# Full ydata reports can be tens of MB each.
+REPORT_CACHE = DiskLRUCache("profiling_reports", max_entries=20, max_bytes=512 * 1024 * 1024)
+DEFAULT_REPORT_ROWS = 50_000
+
+
+def quick_profile(df: pd.DataFrame, profile=None, dataset_id: str = None):
+    """
+    Returns (per-column DataFrame, diagnosis issues dict). Pass the dataset's
+    DatasetProfile if there is one (e.g. CleaningPipeline.profile()).
+    """
+    if profile is None:
+        profile = get_dataset_profile(df, dataset_id)
+    issues = diagnose_data(df)
+    rows = []
+    for col, s in profile.columns.items():
+        rows.append({
+            "column": str(col),
+            "dtype": s["dtype"],
+            "missing": s["nulls"],
+            "missing %": round(100 * s["nulls"] / profile.n_rows, 2) if profile.n_rows else 0.0,
+            "min": s.get("min"),
+            "max": s.get("max"),
+            "mean": s.get("mean"),
+            "top values": ", ".join(f"{v} ({c})" for v, c in s.get("top", [])),
+            "type mismatch": issues["type_mismatches"].get(col, ""),
+        })
+    return pd.DataFrame(rows), issues
+
+
+def report_key(dataset_id: str, max_rows, explorative: bool) -> str:
+    return cache_key(dataset_id, max_rows, explorative)
+
+
+def cached_report_html(dataset_id: str, max_rows=DEFAULT_REPORT_ROWS, explorative: bool = True):
+    """The cached report HTML for these settings, or None."""
+    if not dataset_id:
+        return None
+    return REPORT_CACHE.get(report_key(dataset_id, max_rows, explorative))
+
+
+def detailed_report_html(df: pd.DataFrame, dataset_id: str = None, max_rows=DEFAULT_REPORT_ROWS,
+                         explorative: bool = True, title: str = "Profiling Report", on_progress=None) -> str:
+    """
+    ydata-profiling HTML for at most `max_rows` sampled rows (None = all rows).
+
+    The report is built stage by stage (sample, statistics, report structure,
+    HTML) and `on_progress(fraction, message)` is called as each one finishes.
+    The HTML is cached by (dataset_id, max_rows, explorative).
+    """
+    def progress(fraction, message):
+        if on_progress:
+            on_progress(fraction, message)
+
+    key = report_key(dataset_id, max_rows, explorative) if dataset_id else None
+    if key:
+        html = REPORT_CACHE.get(key)
+        if html is not None:
+            progress(1.0, "Loaded cached report")
+            return html
+
+    from ydata_profiling import ProfileReport
+
+    start = time.perf_counter()
+    data = sample_rows(df, max_rows) if max_rows else df
+    sampled = len(data) < len(df)
+    progress(0.05, f"Profiling {len(data):,} of {len(df):,} rows" if sampled else f"Profiling all {len(df):,} rows")
+
+    report = ProfileReport(
+        data,
+        title=f"{title} (sample of {len(data):,} / {len(df):,} rows)" if sampled else title,
+        explorative=explorative,
+        progress_bar=False,
+        html={"style": {"theme": "cosmo"}},
+    )
+    report.description_set  # column statistics, correlations, missing values, duplicates
+    progress(0.7, f"Statistics computed ({time.perf_counter() - start:.1f}s)")
+    report.report  # report structure
+    progress(0.85, "Report structure built")
+    html = report.to_html()
+    progress(1.0, f"Done in {time.perf_counter() - start:.1f}s")
+
+    if key:
+        REPORT_CACHE.set(key, html)
+    return html
@@ -1,53 +1,265 @@
 # core/prompt_builder.py
-import textwrap
+import re
+import logging
+import weakref
 import pandas as pd
-from utils.schema import dataframe_schema_str
+from utils.schema import DatasetProfile
+from core.keyword_extractor import column_importance
 
-# --- UPDATED FUNCTION ---
-def build_prompt(df: pd.DataFrame, user_query: str, mode: str, profiling_summary: str) -> str:
+logger = logging.getLogger(__name__)
+
+# Rough budget (in tokens) for the schema + statistics sections; keeps wide datasets
+# inside the local model's context window and its prefill time down.
+DEFAULT_TOKEN_BUDGET = 1500
+# Extra room in the per-question suffix for relevant columns the prefix only lists by name.
+QUESTION_COLUMNS_BUDGET = 300
+
+_importance = weakref.WeakKeyDictionary()  # DatasetProfile -> column_importance scores
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English/code)."""
+    return len(text) // 4 + 1
+
+
+def _words(text: str) -> set:
+    return {w.rstrip("s") for w in re.findall(r"[a-z0-9]+", text.lower())}
+
+
+def _names_column(col, query: str) -> bool:
+    name = str(col).lower()
+    return re.search(rf"(?<![a-z0-9_]){re.escape(name)}(?![a-z0-9_])", query) is not None
+
+
+def _names_value(profile: DatasetProfile, col, query: str) -> bool:
+    return any(len(v) > 2 and v.lower() in query for v, _ in profile.columns[col].get("top", []))
+
+
+def _query_score(profile: DatasetProfile, col, query: str, query_words: set) -> float:
+    """
+    How directly the question refers to `col`: 3 for its full name, else up to
+    2 for the share of its name's words in the question; +1 if one of its top
+    values is mentioned.
+    """
+    words = _words(str(col))
+    score = 0.0
+    if _names_column(col, query):
+        score += 3
+    elif words:
+        score += 2 * len(words & query_words) / len(words)
+    if _names_value(profile, col, query):
+        score += 1
+    return score
+
+
+def rank_columns(df: pd.DataFrame, profile: DatasetProfile, user_query: str) -> list:
+    """
+    Orders columns by relevance to the question: name matches first, then
+    columns whose top values are mentioned, then the dataset-level importance
+    score from keyword_extractor (computed once per profile). An empty
+    question gives the query-independent order used for the prompt prefix.
+    """
+    importance = _importance.get(profile)
+    if importance is None:
+        importance = column_importance(df)
+        _importance[profile] = importance
+
+    query = user_query.lower()
+    query_words = _words(query)
+
+    def relevance(col):
+        return float(importance.get(col, 0.0)) + _query_score(profile, col, query, query_words)
+
+    return sorted(profile.columns, key=relevance, reverse=True)
+
+
+def data_context(df: pd.DataFrame, user_query: str, profiling_summary: str, profile=None,
+                 token_budget: int = DEFAULT_TOKEN_BUDGET):
+    """
+    Returns (schema, summary, omitted_columns) for the prompt. If everything
+    fits in `token_budget` it is included as is; otherwise only the
+    highest-ranked columns get full stats and the rest are listed by name.
+    """
+    profile = profile if profile is not None else DatasetProfile.compute(df)
+    schema = profile.schema_str()
+    summary = profiling_summary or profile.summary_str()
+    full_tokens = estimate_tokens(schema) + estimate_tokens(summary)
+    if token_budget is None or full_tokens <= token_budget:
+        return schema, summary, []
+
+    ranked = rank_columns(df, profile, user_query)
+    remaining = token_budget - estimate_tokens(profile.schema_str([])) - estimate_tokens(profile.summary_str([]))
+    names_budget = remaining // 4  # reserved for the names-only list
+    remaining -= names_budget
+
+    chosen = []
+    for col in ranked:
+        cost = _column_tokens(profile, col)
+        if cost > remaining:
+            break
+        chosen.append(col)
+        remaining -= cost
+
+    others, names = ranked[len(chosen):], ""
+    for i, col in enumerate(others):
+        candidate = f"{names}, {col}" if names else str(col)
+        if estimate_tokens(candidate) > names_budget:
+            names += f", ... (+{len(others) - i} more)"
+            break
+        names = candidate
+
+    schema = profile.schema_str(chosen)
+    if others:
+        schema += f"\nOther columns (no stats shown): {names}"
+    summary = profile.summary_str(chosen)
+    logger.info(
+        "Prompt data context pruned: %d/%d columns with stats, ~%d tokens (unpruned ~%d)",
+        len(chosen), len(profile.columns), estimate_tokens(schema) + estimate_tokens(summary), full_tokens,
+    )
+    return schema, summary, others
+
+
+def _column_tokens(profile: DatasetProfile, col) -> int:
+    return estimate_tokens(profile.schema_line(col)) + estimate_tokens("\n".join(profile.summary_lines(col)))
+
+
+def question_columns(profile: DatasetProfile, user_query: str, omitted: list,
+                     token_budget: int = QUESTION_COLUMNS_BUDGET) -> list:
     """
-    Builds the prompt for the LLM, now including a profiling summary for better context.
+    Columns the question clearly refers to (full name, every word of the name,
+    or one of its top values) that the pruned prefix lists without stats.
     """
-    schema = dataframe_schema_str(df)
-    
+    query = user_query.lower()
+    query_words = _words(query)
+    mentioned = [
+        col for col in omitted
+        if _names_column(col, query) or _names_value(profile, col, query)
+        or query_words.issuperset(_words(str(col)) or {None})
+    ]
+    scores = {col: _query_score(profile, col, query, query_words) for col in mentioned}
+    picked = []
+    for col in sorted(mentioned, key=scores.get, reverse=True):
+        cost = _column_tokens(profile, col)
+        if cost > token_budget:
+            break
+        picked.append(col)
+        token_budget -= cost
+    return picked
+
+
+def _task(mode: str) -> str:
     if mode == "visualize":
-        task = (
+        return (
             "Write plotting code using matplotlib. Use df/pd/np/plt. "
             "If counting or grouping, create matching length Series/lists for x and y, then plot them. "
             "You may also set a `result` variable with a short textual answer."
         )
-    elif mode == "summarize":
-        task = (
+    if mode == "summarize":
+        return (
             "Write Python code for a concise textual summary relevant to the user's question. "
             "Assign this summary string to a variable named `result`."
         )
-    else: # analyze
-        task = (
-            "Compute or extract the requested information using pandas. "
-            "If the user asks 'which' or 'what', return the corresponding name/value (not just a number). "
-            "Assign the final value to a variable named `result`."
-        )
+    # analyze
+    return (
+        "Compute or extract the requested information using pandas. "
+        "If the user asks 'which' or 'what', return the corresponding name/value (not just a number). "
+        "Assign the final value to a variable named `result`."
+    )
+
+
+def build_prompt_parts(df: pd.DataFrame, user_query: str, mode: str, profiling_summary: str, profile=None,
+                       token_budget: int = DEFAULT_TOKEN_BUDGET):
+    """
+    Returns (prefix, suffix). The prefix holds the instructions and the dataset
+    context and depends only on the dataset, so it is byte-identical for every
+    question on the same file and Ollama can reuse its KV cache for it. The
+    suffix holds everything that changes per request: extra column stats the
+    question needs, the mode's task and the question itself.
+    """
+    profile = profile if profile is not None else DatasetProfile.compute(df)
+    schema, summary, omitted = data_context(df, "", profiling_summary, profile, token_budget)
+
+    prefix = f"""You are an expert Python data analyst. Your task is to write Python scripts that answer the user's questions about a pandas DataFrame named `df`.
+
+**RULES:**
+1) DO NOT include any import statements; `pd`, `np` and `plt` are already available.
+2) Your final answer MUST be assigned to the `result` variable.
+3) Return ONLY the Python code inside a single markdown ```python ... ``` block. No other text.
+4) Use list comprehensions instead of generator expressions, and never read or write files.
+
+**DataFrame Schema:**
+```
+{schema}
+```
+
+**Key Data Summary & Statistics:**
+```
+{summary}
+```
+"""
+
+    suffix = ""
+    extra = question_columns(profile, user_query, omitted)
+    if extra:
+        details = "\n".join(line for col in extra for line in profile.summary_lines(col))
+        suffix += f"**Columns relevant to this question:**\n```\n{details}\n```\n\n"
+    suffix += f"""**Task:** Based on the user's question and the data summary, {_task(mode)}
+
+**User question:**
+{user_query}
+"""
+    return prefix, suffix
+
+
+def build_messages(df: pd.DataFrame, user_query: str, mode: str, profiling_summary: str, profile=None,
+                   token_budget: int = DEFAULT_TOKEN_BUDGET) -> list:
+    """Chat messages for the LLM: the stable prefix as the system message, the question as the user message."""
+    prefix, suffix = build_prompt_parts(df, user_query, mode, profiling_summary, profile, token_budget)
+    return [("system", prefix), ("human", suffix)]
+
+
+# --- UPDATED FUNCTION ---
+def build_prompt(df: pd.DataFrame, user_query: str, mode: str, profiling_summary: str, profile=None,
+                 token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """
+    Builds the prompt for the LLM as a single string (stable prefix followed by
+    the per-question suffix, see build_prompt_parts).
+    """
+    prefix, suffix = build_prompt_parts(df, user_query, mode, profiling_summary, profile, token_budget)
+    return f"{prefix}\n{suffix}"
+
+
+# --- Self-repair ---
+REPAIR_MAX_COLUMNS = 60
+
+
+def build_repair_messages(code: str, error: str, columns: list, user_query: str, failing_line: str = None,
+                          hint: str = None) -> list:
+    """
+    Small prompt asking the model to fix code that failed: the code, the failing
+    line, the one-line error and the column names/dtypes. No profile or
+    statistics, so a repair costs a fraction of the first generation.
+    """
+    failed_at = f"\n**Failing line:** `{failing_line.strip()}`" if failing_line else ""
+    hint = f"\n**Hint:** {hint}" if hint else ""
+    system = """You fix Python code that failed on a pandas DataFrame named `df`.
+
+**RULES:**
+1) DO NOT include any import statements; `pd`, `np` and `plt` are already available.
+2) Your final answer MUST be assigned to the `result` variable.
+3) Return ONLY the corrected, complete Python code inside a single markdown ```python ... ``` block. No other text.
+4) Use list comprehensions instead of generator expressions, and never read or write files.
+"""
+    human = f"""**User question:**
+{user_query}
+
+**Code:**
+```python
+{code.strip()}
+```
+{failed_at}
+**Error:** {error}{hint}
 
-    # --- UPDATED PROMPT STRING ---
-    return textwrap.dedent(f"""
-    You are an expert Python data analyst. Your task is to write a Python script to answer the user's question about a DataFrame named `df`.
-
-    **DataFrame Schema:**
-    ```
-    {schema}
-    ```
-
-    **Key Data Summary & Statistics:**
-    ```
-    {profiling_summary}
-    ```
-
-    **User question:**
-    {user_query}
-
-    **INSTRUCTIONS:**
-    1) Based on the user's question and the data summary, {task}
-    2) DO NOT include any import statements.
-    3) Your final answer MUST be assigned to the `result` variable.
-    4) Return ONLY the Python code inside a single markdown ```python ... ``` block. No other text.
-    """)
\ No newline at end of file
+**Columns of df:** {", ".join(columns)}
+"""
+    return [("system", system), ("human", human)]
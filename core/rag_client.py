@@ -1,5 +1,8 @@
 # core/rag_client.py
 import os
+import time
+import logging
+import threading
 from typing import Optional
 
 from langchain_community.embeddings import OllamaEmbeddings
@@ -7,6 +10,12 @@ from langchain_community.vectorstores import Chroma
 from langchain_community.chat_models import ChatOllama
 from langchain.chains import RetrievalQA
 
+logger = logging.getLogger(__name__)
+
+# Process-wide timings for the shared clients (seconds are cumulative).
+RAG_METRICS = {"clients_built": 0, "init_seconds": 0.0, "queries": 0, "query_seconds": 0.0}
+_metrics_lock = threading.Lock()
+
 
 class RAGClient:
     """
@@ -59,6 +68,7 @@ class RAGClient:
         if not question.strip():
             return "No question provided."
 
+        start = time.perf_counter()
         try:
             answer = self.qa_chain.run(question)
             if not answer or not answer.strip():
@@ -66,11 +76,62 @@ class RAGClient:
             return answer
         except Exception as e:
             return f"RAG system error: {e}"
+        finally:
+            with _metrics_lock:
+                RAG_METRICS["queries"] += 1
+                RAG_METRICS["query_seconds"] += time.perf_counter() - start
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_rag_client(vector_store_path: str = "vectorstore", model_name: str = "llama3.2:3b", top_k: int = 3) -> RAGClient:
+    """
+    Returns the shared RAGClient for (vector_store_path, model_name, top_k),
+    building it on first use. Clients live for the whole process, so Streamlit
+    reruns and other sessions reuse the same LLM, embeddings and Chroma handle.
+    """
+    key = (vector_store_path, model_name, top_k)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            start = time.perf_counter()
+            client = RAGClient(
+                vector_store_path=vector_store_path,
+                top_k=top_k,
+                embedding_model_name=model_name,
+                llm_model_name=model_name,
+            )
+            elapsed = time.perf_counter() - start
+            with _metrics_lock:
+                RAG_METRICS["clients_built"] += 1
+                RAG_METRICS["init_seconds"] += elapsed
+            logger.info("RAG client for %s built in %.2fs", key, elapsed)
+            _clients[key] = client
+    return client
+
+
+def warm_up_rag(**client_kwargs) -> threading.Thread:
+    """Builds the default client in the background so the first fallback doesn't pay for it."""
+    def _build():
+        try:
+            get_rag_client(**client_kwargs)
+        except Exception as e:
+            logger.warning("RAG warm-up failed: %s", e)
+
+    thread = threading.Thread(target=_build, name="rag-warm-up", daemon=True)
+    thread.start()
+    return thread
 
 
 def rag_answer(question: str, top_k: int = 3) -> str:
     """
     Wrapper for app.py
     """
-    client = RAGClient(top_k=top_k)
+    client = get_rag_client(top_k=top_k)
     return client.ask(question)
@@ -0,0 +1,203 @@
+# core/rag_ingest.py
+"""
+Bulk, incremental ingestion of documents into the RAG vectorstore.
+
+    python -m core.rag_ingest path/to/docs [--store vectorstore] [--workers 4]
+
+Files are hashed and compared with a manifest kept inside the store, so a
+re-run only re-chunks and re-embeds what changed and drops chunks of files
+that were deleted.
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".csv", ".pdf")
+MANIFEST_NAME = "ingest_manifest.json"
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_document(path: str) -> str:
+    """Plain text for txt/md/csv (data dictionaries are read as-is), extracted text for PDF."""
+    if path.lower().endswith(".pdf"):
+        from PyPDF2 import PdfReader
+        return "\n\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 100) -> list:
+    """Packs paragraphs into chunks of at most `chunk_size` characters, hard-splitting oversized ones."""
+    pieces = []
+    for para in text.split("\n\n"):
+        para = para.strip()
+        if not para:
+            continue
+        if len(para) <= chunk_size:
+            pieces.append(para)
+            continue
+        # Oversized paragraph: hard split with overlap.
+        step = max(chunk_size - chunk_overlap, 1)
+        pieces.extend(para[i:i + chunk_size] for i in range(0, len(para), step))
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > chunk_size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _chunk_ids(rel_path: str, n: int) -> list:
+    prefix = hashlib.sha1(rel_path.encode("utf-8")).hexdigest()[:16]
+    return [f"{prefix}-{i}" for i in range(n)]
+
+
+def _load_manifest(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(path: str, manifest: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _walk(folder: str) -> list:
+    found = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                found.append(os.path.join(root, name))
+    return found
+
+
+def ingest_folder(
+    folder: str,
+    vector_store_path: str = "vectorstore",
+    embeddings=None,
+    vstore=None,
+    embedding_model_name: str = "llama3.2:3b",
+    chunk_size: int = 1000,
+    chunk_overlap: int = 100,
+    batch_size: int = 32,
+    max_workers: int = 4,
+) -> dict:
+    """
+    Walks `folder`, chunks new or changed documents, and adds them to the
+    Chroma store in batches on a bounded thread pool (the store embeds each
+    batch; chunk ids are stable, so re-adding a chunk replaces it).
+
+    `embeddings` can be any object with `embed_documents(texts)`, which makes
+    the pipeline testable with a stub; `vstore` overrides the Chroma instance
+    (it then embeds with its own embedding function).
+    Returns counts plus throughput in chunks/s.
+    """
+    start = time.perf_counter()
+    if vstore is None:
+        if embeddings is None:
+            from langchain_community.embeddings import OllamaEmbeddings
+            embeddings = OllamaEmbeddings(model=embedding_model_name)
+        from langchain_community.vectorstores import Chroma
+        vstore = Chroma(persist_directory=vector_store_path, embedding_function=embeddings)
+
+    os.makedirs(vector_store_path, exist_ok=True)
+    manifest_path = os.path.join(vector_store_path, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+    stats = {"files_seen": 0, "files_changed": 0, "files_skipped": 0, "files_removed": 0, "chunks": 0}
+
+    paths = _walk(folder)
+    rel_paths = {p: os.path.relpath(p, folder) for p in paths}
+    stats["files_seen"] = len(paths)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        hashes = dict(zip(paths, pool.map(file_hash, paths)))
+        changed = [p for p in paths if manifest.get(rel_paths[p], {}).get("hash") != hashes[p]]
+        stats["files_skipped"] = len(paths) - len(changed)
+
+        # Files that disappeared since the last run.
+        current = set(rel_paths.values())
+        for rel_path in [r for r in manifest if r not in current]:
+            if manifest[rel_path].get("ids"):
+                vstore.delete(ids=manifest[rel_path]["ids"])
+            del manifest[rel_path]
+            stats["files_removed"] += 1
+
+        # Read + chunk changed files, then queue embedding batches as soon as each file is ready.
+        batch_futures = []
+        chunk_futures = {pool.submit(lambda p: chunk_text(read_document(p), chunk_size, chunk_overlap), p): p
+                         for p in changed}
+        for future in as_completed(chunk_futures):
+            path = chunk_futures[future]
+            rel_path = rel_paths[path]
+            chunks = future.result()
+            ids = _chunk_ids(rel_path, len(chunks))
+
+            # Chunks the store holds for this file, including any the manifest lost track of.
+            known = set(manifest.get(rel_path, {}).get("ids", []))
+            known.update(vstore.get(where={"source": rel_path}, include=[])["ids"])
+            stale = sorted(known - set(ids))
+            if stale:
+                vstore.delete(ids=stale)
+            manifest[rel_path] = {"hash": hashes[path], "ids": ids}
+
+            for i in range(0, len(chunks), batch_size):
+                texts = chunks[i:i + batch_size]
+                metadatas = [{"source": rel_path, "chunk": i + j} for j in range(len(texts))]
+                batch_futures.append(pool.submit(vstore.add_texts, texts, metadatas=metadatas,
+                                                 ids=ids[i:i + batch_size]))
+
+        for future in as_completed(batch_futures):
+            stats["chunks"] += len(future.result())
+
+    stats["files_changed"] = len(changed)
+    _save_manifest(manifest_path, manifest)
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["chunks_per_sec"] = stats["chunks"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest documents into the RAG vectorstore.")
+    parser.add_argument("folder")
+    parser.add_argument("--store", default="vectorstore")
+    parser.add_argument("--model", default="llama3.2:3b")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    stats = ingest_folder(
+        args.folder,
+        vector_store_path=args.store,
+        embedding_model_name=args.model,
+        max_workers=args.workers,
+        batch_size=args.batch_size,
+    )
+    print(
+        f"{stats['files_seen']} files ({stats['files_changed']} changed, {stats['files_skipped']} unchanged, "
+        f"{stats['files_removed']} removed): {stats['chunks']} chunks in {stats['seconds']:.1f}s "
+        f"({stats['chunks_per_sec']:.1f} chunks/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
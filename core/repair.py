@@ -0,0 +1,132 @@
+# core/repair.py
+"""
+Self-repair for generated code that fails in the sandbox: the trimmed error,
+the failing line and the column list go back to the model, and the fixed
+code is re-run, up to a bounded number of attempts and a total time budget.
+"""
+import re
+import time
+import difflib
+import logging
+import textwrap
+import threading
+
+from core.executor import SANDBOX_FILENAME, DATASET_UNAVAILABLE
+from core.llm_client import stream_completion, extract_code, _message_text
+from core.prompt_builder import build_repair_messages, estimate_tokens, REPAIR_MAX_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+REPAIR_ATTEMPTS = 2
+REPAIR_TIME_BUDGET = 45.0  # seconds for all repair attempts of one request together
+# Failures a code edit can't be expected to fix.
+UNREPAIRABLE = frozenset({"Execution timed out.", "Execution cancelled.", "Sandbox worker exited unexpectedly.",
+                          DATASET_UNAVAILABLE})
+
+# Process-wide counters: per attempt number, how often a repair ran, fixed the code, and the seconds it added.
+REPAIR_METRICS = {"failures": 0, "repaired": 0, "attempts": {}}
+_metrics_lock = threading.Lock()
+
+_SANDBOX_FRAME = re.compile(rf'File "{re.escape(SANDBOX_FILENAME)}", line (\d+)')
+_MISSING_KEY = re.compile(r"KeyError: ['\"]?(.+?)['\"]?$")
+
+
+def short_error(error: str) -> str:
+    """The exception line of a traceback (or the whole message if it is one line)."""
+    lines = [line for line in error.strip().splitlines() if line.strip()]
+    return lines[-1].strip() if lines else error
+
+
+def failing_line(error: str, code: str):
+    """The source line the deepest sandbox frame points at, or None."""
+    found = _SANDBOX_FRAME.findall(error)
+    if not found:
+        return None
+    lines = textwrap.dedent(code.replace("```", "")).splitlines()
+    lineno = int(found[-1])
+    return lines[lineno - 1] if 0 < lineno <= len(lines) else None
+
+
+def repair_context(df, error: str):
+    """(column list for the prompt, hint) — a missing column is matched against the real names."""
+    names = [str(col) for col in df.columns]
+    columns = [f"{col} ({dtype})" for col, dtype in df.dtypes.items()][:REPAIR_MAX_COLUMNS]
+    if len(names) > REPAIR_MAX_COLUMNS:
+        columns.append(f"... {len(names) - REPAIR_MAX_COLUMNS} more")
+    hint = None
+    missing = _MISSING_KEY.search(short_error(error))
+    if missing:
+        close = difflib.get_close_matches(missing.group(1), names, n=3, cutoff=0.5)
+        if close:
+            hint = f"There is no column {missing.group(1)!r}; did you mean {', '.join(repr(c) for c in close)}?"
+    return columns, hint
+
+
+def repair_code(llm, df, code: str, error: str, user_query: str) -> str:
+    """One repair round trip: returns the model's corrected code."""
+    columns, hint = repair_context(df, error)
+    prompt = build_repair_messages(code, short_error(error), columns, user_query, failing_line(error, code), hint)
+    start = time.perf_counter()
+    if hasattr(llm, "stream"):
+        response_text = stream_completion(llm, prompt)
+    else:
+        response_text = _message_text(llm.invoke(prompt))
+    logger.info("LLM repair: ~%d prompt tokens, %.2fs",
+                sum(estimate_tokens(text) for _, text in prompt), time.perf_counter() - start)
+    return extract_code(response_text)
+
+
+def _record(attempt: int, fixed: bool, seconds: float):
+    with _metrics_lock:
+        stats = REPAIR_METRICS["attempts"].setdefault(attempt, {"tries": 0, "fixed": 0, "seconds": 0.0})
+        stats["tries"] += 1
+        stats["fixed"] += int(fixed)
+        stats["seconds"] += seconds
+
+
+def run_with_repair(code: str, run, llm, df, user_query: str, max_attempts: int = REPAIR_ATTEMPTS,
+                    time_budget: float = REPAIR_TIME_BUDGET, on_attempt=None):
+    """
+    Runs `code` with `run(code) -> (result, figs, error)`; on a repairable error,
+    asks `llm` for a fix and re-runs it, at most `max_attempts` times and no new
+    attempt once `time_budget` seconds have gone into repairs. `on_attempt(n)` is
+    called before each repair (e.g. to report progress).
+
+    Returns (code, result, figs, error, attempts), where `code` is the last
+    version run and `attempts` lists {"attempt", "fixed", "seconds", "error"}.
+    """
+    result, figs, err = run(code)
+    attempts = []
+    if not err or llm is None or err in UNREPAIRABLE:
+        return code, result, figs, err, attempts
+
+    start = time.monotonic()
+    for n in range(1, max_attempts + 1):
+        if time.monotonic() - start >= time_budget:
+            break
+        if on_attempt:
+            on_attempt(n)
+        t = time.perf_counter()
+        try:
+            fixed_code = repair_code(llm, df, code, err, user_query)
+        except Exception as e:
+            logger.warning("Repair attempt %d failed to generate: %s", n, e)
+            break
+        unchanged = not fixed_code or fixed_code.strip() == code.strip()
+        if not unchanged:
+            code = fixed_code
+            result, figs, err = run(code)
+        seconds = time.perf_counter() - t
+        _record(n, err is None, seconds)
+        attempts.append({"attempt": n, "fixed": err is None, "seconds": seconds,
+                         "error": short_error(err) if err else None})
+        # Same code back (temperature 0) means asking again won't help either.
+        if not err or err in UNREPAIRABLE or unchanged:
+            break
+
+    with _metrics_lock:
+        REPAIR_METRICS["failures"] += 1
+        REPAIR_METRICS["repaired"] += int(err is None)
+    logger.info("Self-repair: %s after %d attempt(s), %.2fs",
+                "fixed" if err is None else "gave up", len(attempts), time.monotonic() - start)
+    return code, result, figs, err, attempts
@@ -0,0 +1,59 @@
+# core/result_cache.py
+import ast
+import functools
+import logging
+
+from core.executor import execute_code
+from utils.disk_cache import DiskLRUCache, cache_key
+
+logger = logging.getLogger(__name__)
+
+# Results + rendered figures of executed analyses, bounded by count and total size on disk.
+RESULT_CACHE = DiskLRUCache("results", max_entries=500, max_bytes=256 * 1024 * 1024)
+
+
+@functools.lru_cache(maxsize=512)
+def code_fingerprint(code: str) -> str:
+    """Hash of the code's AST, so comments, blank lines and formatting don't change it."""
+    try:
+        normalized = ast.unparse(ast.parse(code))
+    except SyntaxError:
+        normalized = code.strip()
+    return cache_key(normalized)
+
+
+def result_key(code: str, dataset_id: str, data_version: str = "") -> str:
+    """(normalized code, dataset content hash, cleaning version) -> cache key."""
+    return cache_key(code_fingerprint(code), dataset_id, data_version)
+
+
+def lookup_result(code: str, dataset_id: str, data_version: str = ""):
+    """Cached (result, figs) for this code on this dataset version, or None."""
+    if not dataset_id:
+        return None
+    return RESULT_CACHE.get(result_key(code, dataset_id, data_version))
+
+
+def run_cached(code: str, df, dataset_id: str, data_version: str = "",
+               timeout: int = 15, use_cache: bool = True, cancel_event=None):
+    """
+    execute_code behind RESULT_CACHE. Returns (result, figs, error);
+    only successful runs are stored, and nothing is cached without a dataset_id,
+    since the frame's content would then be unknown.
+    """
+    key = result_key(code, dataset_id, data_version) if dataset_id else None
+    if use_cache and key:
+        cached = RESULT_CACHE.get(key)
+        if cached is not None:
+            return cached[0], cached[1], None
+
+    shared_id = f"{dataset_id}.{data_version}" if dataset_id and data_version else dataset_id
+    result, figs, err = execute_code(code, df, timeout=timeout, dataset_id=shared_id, cancel_event=cancel_event)
+
+    if key and err is None:
+        try:
+            RESULT_CACHE.set(key, (result, figs))
+        except Exception as e:
+            # Results that can't be pickled are simply not cached.
+            logger.info("Result not cached: %s", e)
+    return result, figs, err
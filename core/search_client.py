@@ -1,17 +1,199 @@
 # core/search_client.py
-from duckduckgo_search import DDGS
+"""
+Web search fallback.
+
+SearchClient sits in front of a pluggable backend: results are cached on
+disk with a TTL by normalized query, identical queries already in flight
+share one request, and the backend is called at most once per
+`min_interval` seconds. DDGSBackend keeps one DuckDuckGo session open;
+FixtureBackend answers from local data, so the fallback can be run,
+tested and benchmarked offline.
+"""
+import re
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+
+from utils.disk_cache import DiskLRUCache, cache_key
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TTL = 24 * 3600  # seconds a cached result set stays valid
+SEARCH_MIN_INTERVAL = 1.0  # seconds between two backend requests
+
+
+def normalize_search_query(query: str) -> str:
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+
+class RateLimiter:
+    """Spaces calls at least `min_interval` seconds apart across threads."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class SearchBackend(ABC):
+    """A search provider: `search` returns a list of {"title", "body", "href"} dicts."""
+
+    name = "base"
+
+    @abstractmethod
+    def search(self, query: str, max_results: int) -> list:
+        """Results for `query`, at most `max_results` of them."""
+
+
+class DDGSBackend(SearchBackend):
+    """DuckDuckGo, through one DDGS session reused across searches (recreated after an error)."""
+
+    name = "ddgs"
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def search(self, query: str, max_results: int) -> list:
+        with self._lock:
+            if self._client is None:
+                from duckduckgo_search import DDGS
+                self._client = DDGS()
+            try:
+                return list(self._client.text(query, max_results=max_results) or [])
+            except Exception:
+                self._client = None
+                raise
+
+
+class FixtureBackend(SearchBackend):
+    """
+    Offline stand-in. `fixtures` maps queries to result lists (or is the path
+    of a JSON file holding that mapping). A query without an exact entry gets
+    the fixture results sharing the most words with it. `latency` seconds are
+    slept per search to imitate a network round trip.
+    """
+
+    name = "fixture"
+
+    def __init__(self, fixtures, latency: float = 0.0):
+        if isinstance(fixtures, str):
+            with open(fixtures, "r", encoding="utf-8") as f:
+                fixtures = json.load(f)
+        self.fixtures = {normalize_search_query(q): results for q, results in fixtures.items()}
+        self.latency = latency
+        self.calls = 0
+
+    def search(self, query: str, max_results: int) -> list:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        q = normalize_search_query(query)
+        if q in self.fixtures:
+            return self.fixtures[q][:max_results]
+        words = set(q.split())
+        scored = []
+        for results in self.fixtures.values():
+            for r in results:
+                overlap = len(words & set(normalize_search_query(f"{r['title']} {r['body']}").split()))
+                if overlap:
+                    scored.append((overlap, r))
+        scored.sort(key=lambda item: -item[0])
+        return [r for _, r in scored[:max_results]]
+
+
+class SearchClient:
+    """Cached, coalescing, rate-limited front end to a SearchBackend."""
+
+    def __init__(self, backend: SearchBackend, cache: DiskLRUCache = None, min_interval: float = SEARCH_MIN_INTERVAL):
+        self.backend = backend
+        self.cache = cache if cache is not None else DiskLRUCache("web_search", max_entries=1000, ttl=SEARCH_TTL)
+        self.limiter = RateLimiter(min_interval)
+        self.requests = 0
+        self.coalesced = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def search(self, query: str, max_results: int = 3) -> list:
+        """Result dicts for `query`; raises whatever the backend raises (errors are never cached)."""
+        key = cache_key(self.backend.name, normalize_search_query(query), max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+
+        try:
+            cached = self.cache.get(key)  # another request may have finished in between
+            if cached is not None:
+                future.set_result(cached)
+                return cached
+            self.limiter.wait()
+            self.requests += 1
+            results = self.backend.search(query, max_results)
+            self.cache.set(key, results)
+            future.set_result(results)
+            return results
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_search_client() -> SearchClient:
+    """The process-wide client, on DuckDuckGo unless set_search_backend chose another backend."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = SearchClient(DDGSBackend())
+        return _client
+
+
+def set_search_backend(backend: SearchBackend, **kwargs) -> SearchClient:
+    """Switches web_search to `backend` (e.g. a FixtureBackend for offline runs)."""
+    global _client
+    with _client_lock:
+        _client = SearchClient(backend, **kwargs)
+        return _client
+
+
+def format_results(results: list) -> str:
+    if not results:
+        return "No relevant results found."
+    return "\n\n".join(f"{r['title']}: {r['body']} ({r['href']})" for r in results)
+
 
 def web_search(query: str, max_results: int = 3) -> str:
     """
-    Performs a DuckDuckGo web search and returns top results as text.
+    Performs a web search and returns top results as text.
     """
     try:
-        results = []
-        with DDGS() as ddgs:
-            for r in ddgs.text(query, max_results=max_results):
-                results.append(f"{r['title']}: {r['body']} ({r['href']})")
-        if not results:
-            return "No relevant results found."
-        return "\n\n".join(results)
+        return format_results(get_search_client().search(query, max_results))
     except Exception as e:
+        logger.warning("Web search failed: %s", e)
         return f"Web search error: {e}"
@@ -0,0 +1,113 @@
+# core/semantic_cache.py
+import re
+import threading
+
+import numpy as np
+
+from core.chat_memory import load_chat_history
+
+# Words that flip or narrow what a question asks for; grouped so synonyms still match.
+_COMPARISONS = {
+    **dict.fromkeys(("most", "highest", "max", "maximum", "top", "best", "largest", "greatest", "more"), "max"),
+    **dict.fromkeys(("least", "lowest", "min", "minimum", "bottom", "worst", "smallest", "fewest", "less", "fewer"),
+                    "min"),
+}
+
+
+def query_signature(query: str) -> tuple:
+    """(numbers, comparison directions) in a question: two questions that differ here need different code."""
+    words = re.findall(r"\d+(?:\.\d+)?|[a-z]+", query.lower())
+    numbers = frozenset(w for w in words if w[0].isdigit())
+    comparisons = frozenset(_COMPARISONS[w] for w in words if w in _COMPARISONS)
+    return numbers, comparisons
+
+
+class SemanticCodeCache:
+    """
+    Reuses code from earlier, successful questions on the same dataset when a
+    new question means the same thing ("top winning team" vs "which team won
+    most matches").
+
+    Candidates come from the chat history store (turns saved with `code` and
+    `mode`) on the same cleaning version of the data. Their query embeddings are
+    computed once, stacked into a unit-norm matrix per (file_id, mode, version),
+    and matched with a single matrix-vector product. A close match is still
+    skipped if the two questions differ in their numbers or comparison words
+    ("top 5" vs "top 10", "most" vs "least"), which embeddings barely tell apart.
+    """
+
+    def __init__(self, embeddings=None, threshold: float = 0.92, embedding_model_name: str = "llama3.2:3b"):
+        self.threshold = threshold
+        self.embedding_model_name = embedding_model_name
+        self.llm_calls_saved = 0
+        self._embeddings = embeddings
+        self._vectors = {}   # query text -> unit vector
+        self._index = {}     # (file_id, mode, data_version) -> (history length, matrix, turns, signatures)
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            # Same local embedding model the RAG fallback uses.
+            from langchain_community.embeddings import OllamaEmbeddings
+            self._embeddings = OllamaEmbeddings(model=self.embedding_model_name)
+        return self._embeddings
+
+    @staticmethod
+    def _unit(vectors) -> np.ndarray:
+        arr = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(arr, axis=-1, keepdims=True)
+        return arr / np.where(norms == 0, 1, norms)
+
+    def _build_index(self, file_id: str, mode: str, data_version: str):
+        history = load_chat_history(file_id)
+        key = (file_id, mode, data_version)
+        cached = self._index.get(key)
+        if cached is not None and cached[0] == len(history):
+            return cached[1], cached[2], cached[3]
+
+        turns = {}
+        for turn in history:
+            if (turn.get("code") and turn.get("mode") == mode and turn.get("data_version", "") == data_version
+                    and not str(turn.get("response", "")).startswith("Error")):
+                turns[turn["query"]] = turn  # latest code per query wins
+        turns = list(turns.values())
+
+        missing = [t["query"] for t in turns if t["query"] not in self._vectors]
+        if missing:
+            for query, vec in zip(missing, self._unit(self.embeddings.embed_documents(missing))):
+                self._vectors[query] = vec
+
+        matrix = np.vstack([self._vectors[t["query"]] for t in turns]) if turns else None
+        signatures = [query_signature(t["query"]) for t in turns]
+        self._index[key] = (len(history), matrix, turns, signatures)
+        return matrix, turns, signatures
+
+    def lookup(self, file_id: str, user_query: str, mode: str, data_version: str = ""):
+        """
+        Returns (code, matched_query, similarity) for the closest earlier question
+        on this data version above the threshold, else None. Embedding failures
+        (e.g. Ollama down) count as a miss.
+        """
+        if not file_id or not user_query.strip():
+            return None
+        try:
+            with self._lock:
+                matrix, turns, signatures = self._build_index(file_id, mode, data_version)
+            if matrix is None:
+                return None
+            query_vec = self._unit(self.embeddings.embed_query(user_query))
+        except Exception:
+            return None
+
+        scores = matrix @ query_vec
+        signature = query_signature(user_query)
+        scores[[i for i, s in enumerate(signatures) if s != signature]] = -1.0
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        self.llm_calls_saved += 1
+        return turns[best]["code"], turns[best]["query"], float(scores[best])
+
+
+SEMANTIC_CACHE = SemanticCodeCache()
@@ -0,0 +1,70 @@
+# core/shared_frame.py
+import pickle
+from multiprocessing import shared_memory
+
+import pandas as pd
+
+
+class SharedFrameHandle:
+    """Small picklable pointer to a published DataFrame; this is all a job carries."""
+
+    def __init__(self, name: str, spans: tuple):
+        self.name = name
+        self.spans = spans
+
+
+class SharedFrame:
+    """
+    A DataFrame published once into a shared memory segment.
+
+    The frame is pickled with protocol 5 so column buffers (numpy and Arrow)
+    are written out-of-band. Workers that attach map those buffers read-only
+    instead of unpickling their own copy; only object columns are rebuilt.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        buffers = []
+        payload = pickle.dumps(df, protocol=5, buffer_callback=buffers.append)
+        chunks = [memoryview(payload)] + [b.raw() for b in buffers]
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(sum(c.nbytes for c in chunks), 1))
+        spans, offset = [], 0
+        for chunk in chunks:
+            self.shm.buf[offset:offset + chunk.nbytes] = chunk
+            spans.append((offset, chunk.nbytes))
+            offset += chunk.nbytes
+        self.handle = SharedFrameHandle(self.shm.name, tuple(spans))
+
+    @property
+    def nbytes(self) -> int:
+        return self.shm.size
+
+    def release(self):
+        """Unlinks the segment. Workers still attached keep their mapping until they drop it."""
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class AttachedFrame:
+    """Worker-side, read-only view of a SharedFrame."""
+
+    def __init__(self, handle: SharedFrameHandle):
+        self.shm = shared_memory.SharedMemory(name=handle.name)
+        buf = self.shm.buf.toreadonly()
+        views = [buf[offset:offset + size] for offset, size in handle.spans]
+        self.df = pickle.loads(views[0], buffers=views[1:])
+
+    def view(self) -> pd.DataFrame:
+        """Returns a per-job shallow copy; writes copy-on-write instead of touching shared pages."""
+        return self.df.copy(deep=False)
+
+    def close(self):
+        self.df = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Some view is still referenced; the mapping goes away with the process.
+            pass
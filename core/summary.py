@@ -1,17 +1,19 @@
 # In core/summary.py
 
 import streamlit as st
-from core.llm_client import get_llm, generate_python_code
-from utils.schema import generate_profiling_summary
+from core.llm_client import get_llm, generate_python_code, remember_code
+from utils.schema import get_dataset_profile
 from core.executor import execute_code
 
-def ai_dataset_summary(df):
+def ai_dataset_summary(df, dataset_id=None, llm=None, cancel_event=None):
     """
     Generates an AI-powered summary of the dataset and RETURNS it as a string.
+    Background jobs pass the `llm` in and a `cancel_event` that stops the sandbox run.
     """
     try:
-        llm = get_llm(model_name="llama3.2:3b")
-        profiling_summary = generate_profiling_summary(df)
+        llm = llm or get_llm(model_name="llama3.2:3b")
+        profile = get_dataset_profile(df, dataset_id)
+        profiling_summary = profile.summary_str()
         
         # A more specific prompt to guide the AI
         prompt = (
@@ -21,14 +23,15 @@ def ai_dataset_summary(df):
         )
         
         code = generate_python_code(
-            llm, df, prompt, mode="summarize", profiling_summary=profiling_summary
+            llm, df, prompt, mode="summarize", profiling_summary=profiling_summary, profile=profile
         )
         
-        result, _, err = execute_code(code, df)
+        result, _, err = execute_code(code, df, dataset_id=dataset_id, cancel_event=cancel_event)
 
         if err:
             return f"Error: Could not generate AI summary.\n\nDetails: {err}"
-        elif result:
+        remember_code(llm, df, prompt, "summarize", profiling_summary, code)
+        if result:
             return result  # <-- Return the successful result
         else:
             return "Info: The AI ran successfully but did not generate a summary."
@@ -1,11 +1,129 @@
 # core/visuals.py
 import streamlit as st
+import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.axes import Axes
 import seaborn as sns
 
+# Above this many rows, plots switch to large-data mode (binned / sampled).
+LARGE_DATA_ROWS = 200_000
+SAMPLE_ROWS = 50_000        # rows kept for sampled plots (scatter, outliers, correlations)
+KDE_SAMPLE_ROWS = 5_000     # points the KDE curve is estimated from
+HIST_BINS = 50
+MAX_HEATMAP_COLS = 20
+ANNOTATE_MAX_COLS = 10
+
+
+def sample_rows(data, n: int = SAMPLE_ROWS, strata=None, seed: int = 0):
+    """
+    Uniform random sample of at most `n` rows of a DataFrame/Series (order kept).
+    With `strata` (a column name), every group is sampled proportionally, and
+    gets at least one row, so rare categories stay visible.
+    """
+    if len(data) <= n:
+        return data
+    rng = np.random.default_rng(seed)
+    if strata is None:
+        return data.iloc[np.sort(rng.choice(len(data), n, replace=False))]
+    frac = n / len(data)
+    picks = [
+        rng.choice(pos, max(1, int(round(len(pos) * frac))), replace=False)
+        for pos in data.groupby(strata, observed=True, sort=False).indices.values()
+    ]
+    return data.iloc[np.sort(np.concatenate(picks))]
+
+
+def sample_note(used: int, total: int) -> str:
+    """Caption saying whether a chart shows all rows or a sample."""
+    if used >= total:
+        return f"exact: all {total:,} rows"
+    return f"sampled: {used:,} of {total:,} rows"
+
+
+def _gaussian_kde(values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """Gaussian KDE (Scott's bandwidth) of `values` evaluated on `grid`."""
+    std = values.std()
+    if len(values) < 2 or std == 0:
+        return np.zeros_like(grid)
+    bw = std * len(values) ** (-1 / 5)
+    z = (grid[:, None] - values[None, :]) / bw
+    return np.exp(-0.5 * z * z).sum(axis=1) / (len(values) * bw * np.sqrt(2 * np.pi))
+
+
+def binned_histogram(ax, series: pd.Series, bins: int = HIST_BINS, kde: bool = True) -> str:
+    """
+    Histogram from np.histogram over every value (exact counts, no per-point
+    drawing), with a KDE curve estimated from a sample. Returns the chart note.
+    """
+    values = series.dropna().to_numpy(dtype=float)
+    if len(values) == 0:
+        return sample_note(0, 0)
+    counts, edges = np.histogram(values, bins=bins)
+    ax.stairs(counts, edges, fill=True, alpha=0.6, edgecolor="black")
+    note = f"exact counts of {len(values):,} values"
+    if kde and len(values) > 1:
+        sample = values if len(values) <= KDE_SAMPLE_ROWS else \
+            np.random.default_rng(0).choice(values, KDE_SAMPLE_ROWS, replace=False)
+        grid = np.linspace(edges[0], edges[-1], 200)
+        ax.plot(grid, _gaussian_kde(sample, grid) * len(values) * (edges[1] - edges[0]))
+        if len(sample) < len(values):
+            note += f"; KDE from {len(sample):,} sampled"
+    ax.set_xlabel(str(series.name))
+    ax.set_ylabel("Count")
+    return note
+
+
+def summary_boxplot(ax, series: pd.Series) -> str:
+    """Boxplot from exact quartiles; only the outliers drawn come from a sample."""
+    values = series.dropna().to_numpy(dtype=float)
+    if len(values) == 0:
+        return sample_note(0, 0)
+    q1, med, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    outliers = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+    shown = outliers if len(outliers) <= SAMPLE_ROWS else \
+        np.random.default_rng(0).choice(outliers, SAMPLE_ROWS, replace=False)
+    ax.bxp([{
+        "med": med, "q1": q1, "q3": q3, "fliers": shown,
+        "whislo": inside.min() if len(inside) else q1, "whishi": inside.max() if len(inside) else q3,
+    }], showfliers=True)
+    ax.set_xticks([1], [str(series.name)])
+    note = f"exact quartiles of {len(values):,} values"
+    if len(shown) < len(outliers):
+        note += f"; {len(shown):,} of {len(outliers):,} outliers drawn"
+    return note
+
+
+def correlation_heatmap(ax, df: pd.DataFrame, numeric_cols: list) -> str:
+    """
+    Correlation heatmap capped at MAX_HEATMAP_COLS columns (highest variance
+    first); cells are annotated only for small matrices. Large frames are
+    correlated on a sample.
+    """
+    data = sample_rows(df) if len(df) > LARGE_DATA_ROWS else df
+    cols = numeric_cols
+    if len(cols) > MAX_HEATMAP_COLS:
+        cols = data[cols].var().sort_values(ascending=False).index[:MAX_HEATMAP_COLS].tolist()
+    data = data[cols]
+    sns.heatmap(data.corr(), annot=len(cols) <= ANNOTATE_MAX_COLS, cmap="coolwarm", ax=ax)
+    note = sample_note(len(data), len(df))
+    if len(cols) < len(numeric_cols):
+        note += f"; top {len(cols)} of {len(numeric_cols)} columns by variance"
+    return note
+
+
+def _annotate(ax, note: str):
+    ax.text(0.99, 0.01, note, transform=ax.transAxes, ha="right", va="bottom", fontsize=7, alpha=0.7)
+
+
 def quick_visuals(df):
     """Generate quick exploratory visuals for the dataset."""
     st.subheader("📊 Quick Visual Insights")
+    large = len(df) > LARGE_DATA_ROWS
+    if large:
+        st.caption(f"Large dataset ({len(df):,} rows): charts use binned counts and samples.")
 
     # Numeric column distribution
     numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
@@ -16,7 +134,11 @@ def quick_visuals(df):
             st.write("Histogram of first numeric column")
             col = numeric_cols[0]
             fig, ax = plt.subplots()
-            sns.histplot(df[col].dropna(), kde=True, ax=ax)
+            if large:
+                _annotate(ax, binned_histogram(ax, df[col]))
+            else:
+                sns.histplot(df[col].dropna(), kde=True, ax=ax)
+                _annotate(ax, sample_note(len(df), len(df)))
             st.pyplot(fig)
 
         if len(numeric_cols) > 1:
@@ -24,12 +146,41 @@ def quick_visuals(df):
                 st.write("Boxplot of second numeric column")
                 col = numeric_cols[1]
                 fig, ax = plt.subplots()
-                sns.boxplot(y=df[col].dropna(), ax=ax)
+                if large:
+                    _annotate(ax, summary_boxplot(ax, df[col]))
+                else:
+                    sns.boxplot(y=df[col].dropna(), ax=ax)
+                    _annotate(ax, sample_note(len(df), len(df)))
                 st.pyplot(fig)
 
     # Correlation heatmap
     if len(numeric_cols) >= 2:
         st.write("Correlation Heatmap")
         fig, ax = plt.subplots(figsize=(6, 4))
-        sns.heatmap(df[numeric_cols].corr(), annot=True, cmap="coolwarm", ax=ax)
+        _annotate(ax, correlation_heatmap(ax, df, numeric_cols))
         st.pyplot(fig)
+
+
+# --- Sandbox: sampled scatter for generated code ---
+_original_scatter = Axes.scatter
+
+
+def _sampled_scatter(self, x, y, *args, **kwargs):
+    """Axes.scatter that draws a uniform sample once there are more than SAMPLE_ROWS points."""
+    n = np.size(x) if not isinstance(x, str) else 0
+    if n <= SAMPLE_ROWS or np.size(y) != n:
+        return _original_scatter(self, x, y, *args, **kwargs)
+    idx = np.sort(np.random.default_rng(0).choice(n, SAMPLE_ROWS, replace=False))
+    x, y = np.asarray(x)[idx], np.asarray(y)[idx]
+    for key in ("s", "c", "linewidths", "edgecolors"):
+        value = kwargs.get(key)
+        if value is not None and not isinstance(value, str) and np.ndim(value) >= 1 and len(value) == n:
+            kwargs[key] = np.asarray(value)[idx]
+    out = _original_scatter(self, x, y, *args, **kwargs)
+    _annotate(self, sample_note(SAMPLE_ROWS, n))
+    return out
+
+
+def install_sampled_scatter():
+    """Makes every scatter (plt.scatter, ax.scatter, df.plot.scatter) sample large inputs. Idempotent."""
+    Axes.scatter = _sampled_scatter
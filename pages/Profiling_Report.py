@@ -1,9 +1,11 @@
+import uuid
 import streamlit as st
-from ydata_profiling import ProfileReport
-import pandas as pd
-import time
-import io
-import base64
+
+from core.data_loader import load_dataset
+from core.data_cleaning import CleaningPipeline
+from core.profiling import quick_profile, cached_report_html, detailed_report_html, DEFAULT_REPORT_ROWS
+from core.jobs import get_job_manager, DONE, FAILED
+from utils.disk_cache import cache_key
 
 # ---------- Streamlit Page Config ----------
 st.set_page_config(
@@ -26,12 +28,13 @@ st.subheader("Select Dataset")
 # Option 1: Upload CSV
 uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"])
 if uploaded_file:
-    df = pd.read_csv(uploaded_file)
+    df, file_id = load_dataset(uploaded_file)
     st.session_state.df = df
     st.session_state.file_name = uploaded_file.name
+    st.session_state.file_id = file_id
     st.success(f"✅ Loaded {uploaded_file.name} ({df.shape[0]} rows, {df.shape[1]} columns)")
 
-# Option 2: Use CSV from app page 
+# Option 2: Use CSV from app page
 elif st.session_state.get("df") is not None:
     df = st.session_state.df
     st.info(f"Using previously loaded CSV: {st.session_state.get('file_name', 'dataset')} ({df.shape[0]} rows, {df.shape[1]} columns)")
@@ -39,52 +42,97 @@ else:
     st.info("Please upload a CSV file or load one from the main app.")
     st.stop()
 
-# ---------- Load Profiling Button ----------
-if st.button("Load the Profile"):
-    st.session_state.load_profile = True
-    st.rerun()
-
-# ---------- Generate Profiling Report ----------
-if st.session_state.get("load_profile"):
-    with st.spinner("⏳ Generating Profiling Report..."):
-        start_time = time.time()
-        progress = st.progress(0)
-        status_text = st.empty()
-
-        # Fake progress for UI
-        for percent in range(0, 50, 10):
-            time.sleep(0.1)
-            progress.progress(percent)
-            status_text.text(f"Initializing... {percent}%")
-
-        try:
-            profile = ProfileReport(
-                df,
-                title="Profiling Report",
-                explorative=True,
-                html={"style": {"theme": "cosmo"}}
-            )
-            html_report = profile.to_html()
-
-            elapsed_time = time.time() - start_time
-            progress.progress(100)
-            status_text.text(f"✅ Done in {elapsed_time:.1f} seconds!")
-
-            # ---------- Download HTML as PDF  ----------
-            pdf_buffer = io.BytesIO()
-            pdf_buffer.write(html_report.encode('utf-8'))
-            pdf_buffer.seek(0)
-
-            # Download button above the report
-            st.download_button(
-                label="📥 Download Profiling Report",
-                data=pdf_buffer,
-                file_name=f"Profiling_Report_{st.session_state.get('file_name','dataset')}.html",
-                mime="text/html"
-            )
-
-            # ---------- Show report in Streamlit ----------
-            st.components.v1.html(html_report, height=800, scrolling=True)
-
-        except Exception as e:
-            st.error(f"❌ Could not generate the profiling report. Error: {e}")
+# Profile the current cleaned version, the same data the main page analyzes.
+pipeline = st.session_state.get("cleaning")
+if pipeline is None or pipeline.base is not st.session_state.df:
+    pipeline = CleaningPipeline.load(st.session_state.df, st.session_state.get("file_id"))
+    st.session_state.cleaning = pipeline
+df = pipeline.df
+dataset_id = pipeline.dataset_id if pipeline.base_id else None
+if pipeline.ops:
+    st.caption("Cleaning applied: " + " → ".join(op["op"] for op in pipeline.ops))
+
+# ---------- Quick Profile (native, vectorized) ----------
+st.subheader("⚡ Quick Profile")
+quick = st.session_state.setdefault("_quick_profiles", {})
+key = dataset_id or id(df)
+if key not in quick:
+    quick.clear()
+    quick[key] = quick_profile(df, pipeline.profile() if dataset_id else None)
+columns_table, issues = quick[key]
+
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Rows", f"{len(df):,}")
+c2.metric("Columns", df.shape[1])
+c3.metric("Missing cells", f"{issues['missing_values']:.2%}")
+c4.metric("Duplicate rows", f"{issues['duplicate_rows']:,}")
+st.dataframe(columns_table, width='stretch', hide_index=True)
+st.caption(f"Computed in {issues['timings']['total']:.2f}s")
+
+# ---------- Detailed Report (ydata-profiling, sampled) ----------
+st.subheader("🔬 Detailed Report")
+sample_options = {f"{n:,} rows": n for n in (10_000, DEFAULT_REPORT_ROWS, 200_000) if n < len(df)}
+sample_options[f"All {len(df):,} rows"] = None
+opt1, opt2 = st.columns(2)
+with opt1:
+    sample_label = st.selectbox("Rows to profile", list(sample_options), index=min(1, len(sample_options) - 1))
+with opt2:
+    explorative = st.checkbox("Explorative (text, interactions)", value=True)
+max_rows = sample_options[sample_label]
+
+report_settings = (key, max_rows, explorative)
+html_report = cached_report_html(dataset_id, max_rows, explorative)
+if html_report is None and st.session_state.get("_last_report", (None,))[0] == report_settings:
+    html_report = st.session_state._last_report[1]  # datasets without an id are not disk-cached
+
+
+def report_job(job, df, dataset_id, max_rows, explorative):
+    return detailed_report_html(df, dataset_id, max_rows, explorative,
+                                on_progress=lambda fraction, message: job.report(message, fraction))
+
+
+@st.fragment(run_every=1.0)
+def report_status(job_id: str):
+    job = manager.get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    st.progress(job.fraction or 0.0)
+    st.text(job.progress or "Queued...")
+    if st.button("✖️ Cancel"):
+        # Another session may still wait for the same report; this one stops following it either way.
+        manager.cancel(job_id, owner=st.session_state.get("session_id"))
+        st.session_state.report_job = None
+        st.rerun()
+
+
+manager = get_job_manager()
+if html_report is None and st.button("Generate Detailed Report"):
+    # Runs in the background: widget changes no longer restart it, and reopening the page picks it up.
+    st.session_state.report_job = (report_settings, manager.submit(
+        report_job, df, dataset_id, max_rows, explorative,
+        label="Profiling report", key=cache_key("profiling", *report_settings) if dataset_id else None,
+        owner=st.session_state.setdefault("session_id", uuid.uuid4().hex),
+    ))
+
+settings, job_id = st.session_state.get("report_job") or (None, None)
+job = manager.get(job_id) if job_id and settings == report_settings else None
+if html_report is None and job is not None:
+    if not job.done:
+        report_status(job_id)
+    elif job.status == DONE:
+        html_report = job.result
+        st.session_state._last_report = (report_settings, html_report)
+    elif job.status == FAILED:
+        if "ModuleNotFoundError" in job.error:
+            st.error("❌ ydata-profiling is not installed; only the quick profile is available.")
+        else:
+            st.error(f"❌ Could not generate the profiling report. Error: {job.error.strip().splitlines()[-1]}")
+
+if html_report is not None:
+    st.download_button(
+        label="📥 Download Profiling Report",
+        data=html_report.encode("utf-8"),
+        file_name=f"Profiling_Report_{st.session_state.get('file_name', 'dataset')}.html",
+        mime="text/html"
+    )
+    st.components.v1.html(html_report, height=800, scrolling=True)
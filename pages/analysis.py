@@ -1,21 +1,17 @@
 import streamlit as st
 import matplotlib.pyplot as plt
-import pandas as pd
-import hashlib, os, logging
+import logging
 
-from core.llm_client import get_llm, generate_python_code
-from core.executor import execute_code
-from utils.schema import generate_profiling_summary
-from core.export_utils import export_csv, export_plots, export_pdf
-from core.chat_memory import load_chat_history, append_chat, save_chat_history
+from core.llm_client import get_llm, generate_python_code, partial_code, remember_code
+from core.result_cache import run_cached
+from utils.schema import get_dataset_profile
+from core.export_utils import export_csv, export_plots, export_pdf, figure_png
+from core.chat_memory import load_recent_chats, append_chat, save_chat_history
+from core.data_loader import load_dataset
 
 # ---------- Logging ----------
 logging.basicConfig(filename="analysis.log", level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# ---------- Paths ----------
-UPLOAD_DIR = os.path.join("chat_history", "uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 # ---------- Streamlit config ----------
 st.set_page_config(page_title="AI Co-Pilot Visualization", page_icon="🧑‍💻", layout="wide")
 st.title("AI Co-Pilot Visualization 🧑‍💻")
@@ -24,9 +20,10 @@ st.title("AI Co-Pilot Visualization 🧑‍💻")
 with st.sidebar:
     st.header("Chats")
     if st.session_state.get("file_id"):
-        history = load_chat_history(st.session_state.file_id)
+        chat_limit = st.session_state.get("chat_limit", 20)
+        history, total_chats = load_recent_chats(st.session_state.file_id, limit=chat_limit)
         if history:
-            for i, chat in enumerate(reversed(history)):
+            for i, chat in enumerate(history):
                 # --- CORRECTED LINE ---
                 st.button(
                     label=chat['query'][:60] + "...",
@@ -34,6 +31,9 @@ with st.sidebar:
                     width='stretch', # <-- Use 'width' instead of 'use_container_width'
                     help=f"Q: {chat['query']}\n\nA: {chat['response']}"
                 )
+            if total_chats > len(history) and st.button("Show older chats", width='stretch'):
+                st.session_state.chat_limit = chat_limit + 20
+                st.rerun()
             # --- CORRECTED LINE ---
             if st.button("🗑️ Clear Chat History", width='stretch'): # <-- Use 'width' instead of 'use_container_width'
                 save_chat_history(st.session_state.file_id, [])
@@ -54,12 +54,8 @@ uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"], key="analysi
 df, file_id = None, None
 
 if uploaded_file:
-    file_path = os.path.join(UPLOAD_DIR, uploaded_file.name)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
     try:
-        df = pd.read_csv(file_path)
-        file_id = uploaded_file.name
+        df, file_id = load_dataset(uploaded_file)
         st.session_state.df = df
         st.session_state.file_id = file_id
     except Exception as e:
@@ -85,8 +81,7 @@ visualize_btn = st.button("📈 Visualize")
 
 def ai_chart_suggestion(df, query):
     if "top 5 run scorer" in query.lower() and 'Score A' in df.columns and 'Score B' in df.columns:
-        df['Total Runs'] = df['Score A'] + df['Score B']
-        top = df.nlargest(5, 'Total Runs')
+        top = df.assign(**{'Total Runs': df['Score A'] + df['Score B']}).nlargest(5, 'Total Runs')
         fig, ax = plt.subplots(figsize=(8, 5)) 
         ax.bar(top.index.astype(str), top['Total Runs'], color='green')
         ax.set_xlabel('Player Index')
@@ -102,14 +97,19 @@ figs, code = [], None
 
 if visualize_btn and user_query:
     try:
-        profiling_summary = generate_profiling_summary(df)
-        code = generate_python_code(get_llm(), df, user_query, mode="visualize", profiling_summary=profiling_summary)
-
-        exec_result, generated_figs, err = execute_code(code, df)
+        profile, llm = get_dataset_profile(df, file_id), get_llm()
+        live_code = st.empty()
+        code = generate_python_code(llm, df, user_query, mode="visualize",
+                                    profiling_summary=profile.summary_str(), profile=profile,
+                                    on_token=lambda text: live_code.code(partial_code(text), language="python"))
+        live_code.empty()
+
+        exec_result, generated_figs, err = run_cached(code, df, file_id)
         if err:
             st.error(f"❌ Execution failed: {err}")
             logging.error(f"Visualization error: {err}")
         else:
+            remember_code(llm, df, user_query, "visualize", profile.summary_str(), code)
             if generated_figs:
                 figs.extend(generated_figs)
 
@@ -117,15 +117,16 @@ if visualize_btn and user_query:
         if suggested_fig:
             figs.append(suggested_fig)
 
-        append_chat(file_id, user_query, "Visualized chart(s)")
+        append_chat(file_id, user_query, "Visualized chart(s)", code=None if err else code, mode="visualize")
 
         if figs:
             tabs = st.tabs(["Plots", "Generated Code"])
             with tabs[0]:
                 st.subheader("Generated Plots")
                 for fig in figs:
-                    fig.set_size_inches(8, 5) 
-                    st.pyplot(fig)
+                    if hasattr(fig, "set_size_inches"):
+                        fig.set_size_inches(8, 5)
+                    st.image(figure_png(fig))
 
             with tabs[1]:
                 if code:
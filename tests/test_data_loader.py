@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.data_loader import detect_encoding, optimize_dtypes, parse_csv
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def test_latin1_csv_is_decoded_as_text():
+    with open(os.path.join(FIXTURES, "latin1.csv"), "rb") as f:
+        raw = f.read()
+    assert detect_encoding(raw) == "latin-1"
+    df = parse_csv(raw)
+    assert df["name"].tolist() == ["José", "Müller"]
+    assert df["city"].tolist() == ["São Paulo", "Köln"]
+
+
+def test_utf8_and_bom_csv():
+    text = "name,n\nJosé,1\n"
+    assert parse_csv(text.encode("utf-8"))["name"].tolist() == ["José"]
+    bom = parse_csv(b"\xef\xbb\xbf" + text.encode("utf-8"))
+    assert list(bom.columns) == ["name", "n"]
+
+
+def test_integer_columns_keep_64_bits():
+    n = 2000
+    df = optimize_dtypes(pd.DataFrame({
+        "a": np.full(n, 79_999_999, dtype=np.int64),
+        "b": np.full(n, 79_999_999, dtype=np.int64),
+        "team": np.array(["x", "y"])[np.arange(n) % 2],
+    }))
+    assert df["a"].dtype == np.int64
+    assert (df["a"] * df["b"]).iloc[0] == 79_999_999 ** 2
+    assert isinstance(df["team"].dtype, pd.CategoricalDtype)
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+from core.executor import execute_code, sanitize_code
+
+ESCAPES = [
+    # generator / coroutine frames -> the real builtins
+    'g = (x for x in [1]); result = g.gi_frame.f_back.f_back.f_builtins["open"]("/etc/hostname").read()',
+    "def f():\n    yield 1\nresult = f().gi_frame",
+    "def f():\n    yield from [1]\nresult = f()",
+    "async def f():\n    pass\nresult = f().cr_frame",
+    "result = tb.tb_frame",
+    "result = frame.f_globals",
+    "result = code.co_consts",
+    "result = agen.ag_frame",
+    # module aliases
+    'm = np; result = m.ctypeslib.load_library("libc.so.6", "/lib")',
+    "np = pd",
+    "for plt in [1]:\n    pass",
+    # expression strings
+    'result = df.query("a.__class__.__subclasses__()")',
+    'result = df.eval("a.__class__")',
+    'result = pd.eval("df.__class__.__mro__")',
+    'expr = "a > 1"; result = df.query(expr)',
+    'q = df.query; result = q("a > 1")',
+    # file I/O
+    'df.to_csv("/tmp/out.csv")',
+    'df.to_string(buf="/tmp/out.txt")',
+    'df.to_json(**{"path_or_buf": "/tmp/out.json"})',
+    'f = df.to_csv; f("/tmp/out.csv")',
+    'df.to_pickle("/tmp/out.pkl")',
+    'result = pd.read_pickle("/tmp/out.pkl")',
+    'plt.imsave("/tmp/out.png", [[0]])',
+    'np.lib.format.open_memmap("/tmp/out.npy")',
+]
+
+
+@pytest.mark.parametrize("code", ESCAPES)
+def test_escape_is_rejected(code):
+    with pytest.raises(ValueError):
+        sanitize_code(code)
+
+
+@pytest.mark.parametrize("code", [
+    "result = df.to_string()",
+    "result = df.to_markdown(index=False)",
+    "result = df.to_csv(index=False)",
+    'result = df.to_json(orient="records")',
+    'result = df.query("a > 1 and `b c` < 6")',
+    'x = 1\nresult = df.query("a > @x")',
+    'result = df.eval("a + 1")',
+    'result = pd.to_numeric(df["a"]).sum()',
+    "result = np.linalg.norm([3, 4])",
+])
+def test_in_memory_code_is_allowed(code):
+    sanitize_code(code)
+
+
+def test_module_alias_is_checked_at_run_time():
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    result, figs, err = execute_code("m = np; result = m.lib.format", df)
+    assert result is None
+    assert "Blocked unsafe module in code: .lib" in err
+
+
+def test_allowed_code_runs():
+    df = pd.DataFrame({"a": [1, 2, 3], "b c": [4, 5, 6]})
+    result, figs, err = execute_code('result = df.query("a > 1 and `b c` < 6").to_csv(index=False)', df)
+    assert err is None
+    assert result == "a,b c\n2,5\n"
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from core.jobs import CANCELLED, DONE, JobManager
+
+
+def wait_for_release(job, release):
+    while not release.wait(0.01):
+        job.check()
+    return "ok"
+
+
+def finished(manager, job_id):
+    deadline = time.time() + 10
+    while not manager.get(job_id).done and time.time() < deadline:
+        time.sleep(0.01)
+    return manager.get(job_id)
+
+
+def test_shared_job_survives_one_session_cancelling():
+    manager, release = JobManager(max_workers=2), threading.Event()
+    try:
+        first = manager.submit(wait_for_release, release, key="same", owner="session-a")
+        second = manager.submit(wait_for_release, release, key="same", owner="session-b")
+        assert first == second
+
+        assert manager.cancel(first, owner="session-a") is False
+        assert not manager.get(first).cancelled
+        release.set()
+        assert finished(manager, first).status == DONE
+    finally:
+        release.set()
+        manager.shutdown()
+
+
+def test_job_stops_once_every_session_cancelled():
+    manager, release = JobManager(max_workers=2), threading.Event()
+    try:
+        job_id = manager.submit(wait_for_release, release, key="same", owner="session-a")
+        manager.submit(wait_for_release, release, key="same", owner="session-b")
+        manager.cancel(job_id, owner="session-a")
+        assert manager.cancel(job_id, owner="session-b") is True
+        # A fresh request after the cancel is not attached to the dying job.
+        assert manager.submit(wait_for_release, release, key="same", owner="session-a") != job_id
+        assert finished(manager, job_id).status == CANCELLED
+    finally:
+        release.set()
+        manager.shutdown()
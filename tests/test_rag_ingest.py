@@ -0,0 +1,61 @@
+from core.rag_ingest import ingest_folder
+
+
+class StubEmbeddings:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+
+class StubStore:
+    """In-memory stand-in for the Chroma store: embeds on add, replaces by id."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.docs = {}  # id -> (text, metadata, vector)
+
+    def add_texts(self, texts, metadatas=None, ids=None):
+        vectors = self.embeddings.embed_documents(texts)
+        for text, metadata, vector, doc_id in zip(texts, metadatas, vectors, ids):
+            self.docs[doc_id] = (text, metadata, vector)
+        return ids
+
+    def get(self, where=None, include=None):
+        return {"ids": [i for i, (_, meta, _) in self.docs.items() if meta["source"] == where["source"]]}
+
+    def delete(self, ids=None):
+        for doc_id in ids:
+            self.docs.pop(doc_id, None)
+
+
+def test_reingest_keeps_ids_and_skips_unchanged_files(tmp_path):
+    docs, store_dir = tmp_path / "docs", tmp_path / "store"
+    docs.mkdir()
+    (docs / "a.md").write_text("alpha\n\n" + "x" * 50, encoding="utf-8")
+    (docs / "b.txt").write_text("beta", encoding="utf-8")
+    embeddings = StubEmbeddings()
+    store = StubStore(embeddings)
+
+    first = ingest_folder(str(docs), str(store_dir), vstore=store, chunk_size=20, chunk_overlap=5)
+    assert (first["files_changed"], first["files_skipped"]) == (2, 0)
+    ids = set(store.docs)
+
+    embeddings.embedded.clear()
+    second = ingest_folder(str(docs), str(store_dir), vstore=store, chunk_size=20, chunk_overlap=5)
+    assert (second["files_changed"], second["files_skipped"], second["chunks"]) == (0, 2, 0)
+    assert embeddings.embedded == []
+    assert set(store.docs) == ids
+
+    (docs / "b.txt").write_text("beta, edited", encoding="utf-8")
+    third = ingest_folder(str(docs), str(store_dir), vstore=store, chunk_size=20, chunk_overlap=5)
+    assert (third["files_changed"], third["files_skipped"]) == (1, 1)
+    assert embeddings.embedded == ["beta, edited"]
+    assert set(store.docs) == ids  # the edited file's chunk is replaced under the same id
+
+    (docs / "a.md").unlink()
+    fourth = ingest_folder(str(docs), str(store_dir), vstore=store, chunk_size=20, chunk_overlap=5)
+    assert fourth["files_removed"] == 1
+    assert {meta["source"] for _, meta, _ in store.docs.values()} == {"b.txt"}
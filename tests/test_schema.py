@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import data_cleaning
+from core.data_cleaning import CleaningPipeline
+from utils import schema
+from utils.schema import DatasetProfile
+
+
+@pytest.fixture
+def no_detection(tmp_path, monkeypatch):
+    monkeypatch.setattr(schema, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(data_cleaning, "CLEANING_DIR", str(tmp_path))
+    monkeypatch.setattr(schema, "_profiles", {})
+
+    def detect(self, df):
+        raise AssertionError("changed columns should not be auto-detected")
+
+    monkeypatch.setattr(DatasetProfile, "changed_columns", detect)
+
+
+def test_pipeline_profile_uses_cleaning_columns(no_detection):
+    base = pd.DataFrame({"a": [1.0, np.nan, 3.0], "b": ["x", "y", "x"]})
+    pipeline = CleaningPipeline(base, "upload")
+    raw = pipeline.profile()
+    assert pipeline.profile() is raw  # same id, same data: reused as is
+
+    pipeline.add("fill_missing", strategy="mean")
+    cleaned = pipeline.profile()
+    assert cleaned.columns["a"]["nulls"] == 0
+    assert cleaned.columns["b"] is raw.columns["b"]
+    assert pipeline.profile() is cleaned
@@ -0,0 +1,144 @@
+import os
+import time
+import pickle
+import hashlib
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "..", "chat_history", "cache")
+
+
+def cache_key(*parts) -> str:
+    """Stable hex key for any mix of strings/numbers."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class DiskLRUCache:
+    """
+    Small pickle-per-entry cache on disk with LRU eviction.
+
+    Each entry is one file; reads bump its mtime, and once the cache holds more
+    than `max_entries` files (or, with `max_bytes`, more than that many bytes)
+    the least recently used ones are deleted. With `ttl` (seconds), entries
+    older than that since they were written are treated as missing.
+    """
+
+    def __init__(self, name: str, max_entries: int = 500, max_bytes: int = None, ttl: float = None):
+        self.dir = os.path.join(CACHE_DIR, name)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._count = None
+        self._bytes = None
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.dir, f"{key}.pkl")
+
+    def get(self, key: str, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            if self.ttl is not None:
+                # Entries carry their write time; mtime can't, since reads bump it for the LRU order.
+                written, value = value
+                if time.time() - written > self.ttl:
+                    self.delete(key)
+                    raise FileNotFoundError(path)
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError, TypeError, ValueError):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value):
+        path = self._path(key)
+        if self.ttl is not None:
+            value = (time.time(), value)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except BaseException:
+            # e.g. an unpicklable value: don't leave the partial file behind.
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        size = os.path.getsize(tmp)
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = None
+        os.replace(tmp, path)
+        with self._lock:
+            if self._count is None:
+                self._count, self._bytes = self._totals()
+            else:
+                if old_size is None:
+                    self._count += 1
+                self._bytes += size - (old_size or 0)
+            if self._count > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                self._evict()
+
+    def delete(self, key: str):
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._count:
+                self._count -= 1
+                self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            for path in self._entries():
+                os.remove(path)
+            self._count, self._bytes = 0, 0
+
+    def _entries(self):
+        return [os.path.join(self.dir, n) for n in os.listdir(self.dir) if n.endswith(".pkl")]
+
+    def _stat_entries(self):
+        """(mtime, size, path) for every entry, oldest first."""
+        entries = []
+        for path in self._entries():
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        return entries
+
+    def _totals(self):
+        entries = self._stat_entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def _evict(self):
+        entries = self._stat_entries()
+        count, total = len(entries), sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if count <= self.max_entries and (not self.max_bytes or total <= self.max_bytes):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total -= size
+        self._count, self._bytes = count, total
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": self._count, "bytes": self._bytes}
@@ -1,13 +1,190 @@
+import os
+import json
+import threading
+
+import numpy as np
 import pandas as pd
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.path.join(BASE_DIR, "..", "chat_history", "uploads")
+
+
+def _fmt(value, dtype) -> str:
+    """Formats an aggregated stat the way the column's own scalar would print."""
+    if pd.isna(value):
+        return "nan"
+    if pd.api.types.is_bool_dtype(dtype):
+        return str(bool(value))
+    if pd.api.types.is_integer_dtype(dtype):
+        return str(int(value))
+    return str(value)
+
+
+class DatasetProfile:
+    """
+    Per-column schema and summary statistics for one dataset version.
+
+    Stats are computed with frame-wide vectorized reductions (null counts,
+    first non-null example, min/max/mean over all numeric columns at once);
+    only the top-value counts are per text column. Profiles are persisted next
+    to the upload and refreshed only for the columns that changed.
+    """
+
+    def __init__(self, n_rows: int, columns: dict):
+        self.n_rows = n_rows
+        self.columns = columns  # name -> stats dict, in column order
+
+    @classmethod
+    def compute(cls, df: pd.DataFrame, columns=None):
+        return cls(len(df), cls._column_stats(df, list(df.columns) if columns is None else list(columns)))
+
+    @staticmethod
+    def _column_stats(df: pd.DataFrame, columns: list) -> dict:
+        if not columns:
+            return {}
+        sub = df[columns]
+        notna = sub.notna()
+        non_null = notna.sum().to_numpy()
+        first_pos = notna.to_numpy().argmax(axis=0) if len(sub) else np.zeros(len(columns), dtype=int)
+
+        numeric = [c for c in columns if pd.api.types.is_numeric_dtype(sub[c])]
+        if numeric:
+            num = sub[numeric]
+            mins, maxs, means = num.min(), num.max(), num.mean()
+
+        stats = {}
+        for j, col in enumerate(columns):
+            series = sub.iloc[:, j]
+            entry = {
+                "dtype": str(series.dtype),
+                "nulls": int(len(sub) - non_null[j]),
+                "example": repr(series.iat[first_pos[j]]) if non_null[j] > 0 else "None",
+            }
+            if col in numeric:
+                entry["min"] = _fmt(mins[col], series.dtype)
+                entry["max"] = _fmt(maxs[col], series.dtype)
+                entry["mean"] = float(means[col])
+            elif pd.api.types.is_string_dtype(series.dtype) or isinstance(series.dtype, pd.CategoricalDtype):
+                top_vals = series.value_counts().head(3)
+                entry["top"] = [[str(v), int(c)] for v, c in zip(top_vals.index, top_vals.values)]
+            stats[col] = entry
+        return stats
+
+    def changed_columns(self, df: pd.DataFrame) -> list:
+        """Columns whose dtype or null count no longer match; every column if the row count changed."""
+        if len(df) != self.n_rows:
+            return list(df.columns)
+        nulls = df.isna().sum()
+        return [
+            col for col in df.columns
+            if col not in self.columns
+            or self.columns[col]["dtype"] != str(df[col].dtype)
+            or self.columns[col]["nulls"] != int(nulls[col])
+        ]
+
+    def update(self, df: pd.DataFrame, changed_columns=None):
+        """Returns a profile for `df`, recomputing only `changed_columns` (auto-detected if None)."""
+        if changed_columns is None:
+            changed_columns = self.changed_columns(df)
+        if len(df) != self.n_rows:
+            changed_columns = list(df.columns)
+        if not changed_columns and list(df.columns) == list(self.columns):
+            return self
+        changed = set(changed_columns) | {c for c in df.columns if c not in self.columns}
+        fresh = self._column_stats(df, [c for c in df.columns if c in changed])
+        return DatasetProfile(
+            len(df), {col: fresh[col] if col in changed else self.columns[col] for col in df.columns}
+        )
+
+    def describes(self, df: pd.DataFrame) -> bool:
+        """Cheap shape check: same row count, column order and dtypes (no pass over the data)."""
+        return (
+            len(df) == self.n_rows
+            and list(df.columns) == list(self.columns)
+            and all(self.columns[col]["dtype"] == str(dtype) for col, dtype in df.dtypes.items())
+        )
+
+    def schema_line(self, col) -> str:
+        s = self.columns[col]
+        return f" - {col} ({s['dtype']}), example: {s['example']}"
+
+    def summary_lines(self, col) -> list:
+        s = self.columns[col]
+        lines = [f"- {col} ({s['dtype']})"]
+        if "mean" in s:
+            lines.append(f"  * min: {s['min']}, max: {s['max']}, mean: {s['mean']:.2f}")
+        elif "top" in s:
+            top_str = ", ".join([f"{v} ({c})" for v, c in s["top"]])
+            lines.append(f"  * top values: {top_str}")
+        return lines
+
+    def schema_str(self, columns=None) -> str:
+        buf = [f"Rows: {self.n_rows}", "Columns:"]
+        for col in self.columns if columns is None else columns:
+            buf.append(self.schema_line(col))
+        return "\n".join(buf)
+
+    def summary_str(self, columns=None) -> str:
+        summary = [f"Dataset has {self.n_rows} rows and {len(self.columns)} columns."]
+        for col in self.columns if columns is None else columns:
+            summary.extend(self.summary_lines(col))
+        return "\n".join(summary)
+
+    def to_dict(self) -> dict:
+        return {"n_rows": self.n_rows, "columns": self.columns}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["n_rows"], data["columns"])
+
+
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+
+def _profile_path(file_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{file_id}.profile.json")
+
+
+def get_dataset_profile(df: pd.DataFrame, file_id: str = None, changed_columns=None,
+                        base_id: str = None) -> DatasetProfile:
+    """
+    Returns the profile for `df`, computed once per `file_id` and persisted in
+    chat_history/uploads/. Ids name content (upload hash, cleaning version), so
+    a cached profile whose shape still matches is returned without looking at
+    the data. A cleaned version with no profile yet starts from its `base_id`'s
+    profile and recomputes only `changed_columns` (detected if not given).
+    """
+    if not file_id:
+        return DatasetProfile.compute(df)
+
+    with _profiles_lock:
+        profile = _profiles.get(file_id)
+        if profile is None:
+            try:
+                with open(_profile_path(file_id), "r", encoding="utf-8") as f:
+                    profile = DatasetProfile.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError):
+                profile = None
+
+        if profile is not None:
+            updated = profile if profile.describes(df) else profile.update(df)
+        elif base_id and base_id != file_id and base_id in _profiles:
+            # A cleaned version: only the columns cleaning changed are recomputed.
+            updated = _profiles[base_id].update(df, changed_columns)
+        else:
+            updated = DatasetProfile.compute(df)
+
+        if updated is not profile:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with open(_profile_path(file_id), "w", encoding="utf-8") as f:
+                json.dump(updated.to_dict(), f, ensure_ascii=False)
+        _profiles[file_id] = updated
+        return updated
+
+
 def dataframe_schema_str(df: pd.DataFrame) -> str:
-    buf = [f"Rows: {len(df)}", "Columns:"]
-    for col in df.columns:
-        dtype = str(df[col].dtype)
-        non_null_vals = df[col].dropna()
-        sample = repr(non_null_vals.iloc[0]) if len(non_null_vals) > 0 else "None"
-        buf.append(f" - {col} ({dtype}), example: {sample}")
-    return "\n".join(buf)
+    return DatasetProfile.compute(df).schema_str()
 
 
 
@@ -20,18 +197,4 @@ def generate_profiling_summary(df: pd.DataFrame) -> str:
     - Top 3 unique values per categorical column
     - Basic stats for numeric columns
     """
-    summary = [f"Dataset has {df.shape[0]} rows and {df.shape[1]} columns."]
-    
-    # Column info
-    for col in df.columns:
-        dtype = str(df[col].dtype)
-        summary.append(f"- {col} ({dtype})")
-        
-        if pd.api.types.is_numeric_dtype(df[col]):
-            summary.append(f"  * min: {df[col].min()}, max: {df[col].max()}, mean: {df[col].mean():.2f}")
-        elif pd.api.types.is_object_dtype(df[col]):
-            top_vals = df[col].value_counts().head(3)
-            top_str = ", ".join([f"{v} ({c})" for v, c in zip(top_vals.index, top_vals.values)])
-            summary.append(f"  * top values: {top_str}")
-    
-    return "\n".join(summary)
+    return DatasetProfile.compute(df).summary_str()